@@ -0,0 +1,127 @@
+"""Параллельное вычисление независимых частей профиля набора данных."""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import span
+
+DEFAULT_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', str(os.cpu_count() or 1)))
+DEFAULT_EXECUTOR = os.environ.get('ANALYSIS_EXECUTOR', 'thread')
+ROW_CHUNK = 250_000
+COLUMN_BLOCKS_PER_WORKER = 4
+
+STAT_COLUMNS = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max', 'skewness', 'kurtosis',
+                'inf', 'outliers']
+
+
+def _timed(func, item):
+    start = time.perf_counter()
+    result = func(item)
+    return result, time.perf_counter() - start
+
+
+class AnalysisEngine:
+    """Пул потоков или процессов для независимых задач профиля.
+
+    Задачи - функции уровня модуля от одного аргумента (столбец или часть
+    строк), поэтому они одинаково выполняются и в потоках, и в процессах.
+    Время каждой задачи измеряется в самом исполнителе.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, kind=DEFAULT_EXECUTOR):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Неизвестный тип исполнителя: {kind}")
+        self.max_workers = max(1, max_workers)
+        self.kind = kind
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                executor_cls = ProcessPoolExecutor if self.kind == 'process' else ThreadPoolExecutor
+                self._executor = executor_cls(max_workers=self.max_workers)
+            return self._executor
+
+    def map(self, task, func, items, labels=None, timings=None):
+        """Результаты func(item) в исходном порядке.
+
+        В timings (список) добавляются записи (задача, метка, секунды).
+        Задачи не должны сами вызывать map - пул общий.
+        """
+        items = list(items)
+        labels = range(len(items)) if labels is None else labels
+        with span(f"{task} ({len(items)} задач)"):
+            if self.max_workers == 1 or len(items) < 2:
+                outputs = [_timed(func, item) for item in items]
+            else:
+                outputs = list(self._get_executor().map(_timed, [func] * len(items), items))
+        if timings is not None:
+            timings.extend((task, label, seconds) for label, (_, seconds) in zip(labels, outputs))
+        return [result for result, _ in outputs]
+
+    def column_blocks(self, columns):
+        """Разбиение столбцов на блоки, чтобы на широких таблицах задач хватило всем исполнителям."""
+        if len(columns) == 0:
+            return []
+        n_blocks = min(len(columns), self.max_workers * COLUMN_BLOCKS_PER_WORKER)
+        return np.array_split(np.arange(len(columns)), n_blocks)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+def numeric_column_stats(series):
+    """describe(), асимметрия, эксцесс, число бесконечностей и выбросов (1.5 * IQR) одного столбца."""
+    stats = series.describe()
+    q1, q3 = stats['25%'], stats['75%']
+    iqr = q3 - q1
+    return [*stats.reindex(STAT_COLUMNS[:8]), series.skew(), series.kurtosis(),
+            int(np.isinf(series.to_numpy(dtype=np.float64, na_value=np.nan)).sum()),
+            int(((series < q1 - 1.5 * iqr) | (series > q3 + 1.5 * iqr)).sum())]
+
+
+def block_null_bits(block):
+    """Упакованные маски пропусков столбцов блока: массив (столбцы x байты), по одному столбцу за раз."""
+    return np.vstack([np.packbits(block[col].isna().to_numpy()) for col in block.columns])
+
+
+def block_nunique(block):
+    return block.nunique().to_numpy()
+
+
+def row_hashes(chunk):
+    return pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+
+
+def build_sketch(args):
+    """(скетч, значения, размер порции) -> скетч, обновленный всеми значениями по порциям."""
+    sketch, values, batch_rows = args
+    for start in range(0, len(values), batch_rows):
+        sketch.update(values[start:start + batch_rows])
+    return sketch
+
+
+def row_chunks(df, chunk_rows=ROW_CHUNK):
+    return [df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows)]
+
+
+def timing_frame(timings):
+    """Сводка времени по задачам: число подзадач, суммарное и максимальное время."""
+    frame = pd.DataFrame(list(timings), columns=['Задача', 'Объект', 'Время, с'])
+    summary = frame.groupby('Задача', sort=False)['Время, с'].agg(['count', 'sum', 'max'])
+    return summary.rename(columns={'count': 'Подзадач', 'sum': 'Суммарно, с', 'max': 'Максимум, с'})
+
+
+_ENGINE = AnalysisEngine()
+
+
+def get_engine():
+    return _ENGINE
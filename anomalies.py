@@ -0,0 +1,327 @@
+"""Поиск аномалий сразу по всем числовым столбцам.
+
+Одномерные методы (робастный z по MAD, правило 1.5 * IQR с квартилями из
+профиля) обходят столбцы по одному; для каждого столбца сохраняется только
+упакованная по битам маска аномалий. Многомерные - расстояние Махаланобиса
+с робастной ковариацией (C-шаги MCD) и изолирующий лес на подвыборках -
+обучаются на подвыборке строк, а оценивают таблицу частями по CHUNK_BYTES,
+поэтому плотная матрица всех числовых столбцов целиком не строится. Оценки
+кэшируются по набору данных, так что смена столбца или метода в интерфейсе
+ничего не пересчитывает.
+"""
+import warnings
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from data_profile import DEFAULT_RANK_ERROR, get_profile
+from memo import memoize
+
+ANOMALY_METHODS = {
+    'iqr': 'Правило 1.5 × IQR',
+    'mad': 'Робастный z-score (MAD)',
+    'mahalanobis': 'Махаланобис (робастная ковариация)',
+    'isolation': 'Изолирующий лес (подвыборки)'
+}
+UNIVARIATE_METHODS = ('iqr', 'mad')
+
+IQR_FACTOR = 1.5
+MAD_THRESHOLD = 3.5
+MAHALANOBIS_QUANTILE = 0.975
+MCD_SUPPORT = 0.75
+MCD_MAX_ROWS = 50_000
+MCD_STEPS = 20
+ISOLATION_TREES = 100
+ISOLATION_SAMPLE = 256
+ISOLATION_THRESHOLD = 0.6
+CHUNK_BYTES = 64 * 1024 ** 2
+
+
+class AnomalyScores:
+    """Оценки аномальности: по строке (scores/flags) и, для одномерных методов, по столбцам.
+
+    Для одномерных методов строка аномальна, если аномально значение хотя бы
+    в одном столбце, а ее оценка - максимум по столбцам. Маски столбцов
+    хранятся упакованными по битам (column_bits[i] - столбец columns[i]).
+    """
+
+    def __init__(self, method, columns, scores, threshold, column_bits=None, counts=None, bounds=None):
+        self.method = method
+        self.columns = pd.Index(columns)
+        self.scores = scores
+        self.threshold = threshold
+        self.flags = scores > threshold
+        self.column_bits = column_bits
+        self.counts = counts
+        self.bounds = bounds
+
+    @property
+    def count(self):
+        return int(self.flags.sum())
+
+    def column_flags(self, col):
+        if self.column_bits is None:
+            return self.flags
+        return np.unpackbits(self.column_bits[self.columns.get_loc(col)], count=len(self.scores)).astype(bool)
+
+    def column_counts(self):
+        """Число аномальных значений по столбцам (только одномерные методы)."""
+        return self.counts
+
+    def top_rows(self, n=20):
+        """Позиции n строк с наибольшей оценкой, по убыванию."""
+        scores = np.nan_to_num(self.scores, nan=-np.inf)
+        top = np.argpartition(-scores, min(n, len(scores) - 1))[:n] if len(scores) > n else np.arange(len(scores))
+        return top[np.argsort(-scores[top], kind='stable')]
+
+
+@contextmanager
+def _quiet():
+    """Без предупреждений о пустых и полностью пропущенных столбцах - они дают NaN."""
+    with warnings.catch_warnings(), np.errstate(all='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        yield
+
+
+def column_values(df, col):
+    return df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def column_medians(df, columns):
+    """Медианы конечных значений по столбцам (0 для столбцов без них) - для заполнения пропусков."""
+    medians = np.zeros(len(columns))
+    for position, col in enumerate(columns):
+        values = column_values(df, col)
+        values = values[np.isfinite(values)]
+        if len(values):
+            medians[position] = np.median(values)
+    return medians
+
+
+def _fill(values, medians):
+    """Пропуски и бесконечности заменяются медианой столбца - для многомерных методов."""
+    return np.where(np.isfinite(values), values, medians)
+
+
+def sample_matrix(df, columns, positions, medians):
+    """Заполненная матрица строк positions (len(positions) x len(columns))."""
+    return _fill(np.column_stack([column_values(df, col)[positions] for col in columns]), medians)
+
+
+def filled_chunks(df, columns, medians, chunk_bytes=CHUNK_BYTES):
+    """Заполненные части таблицы (начало, массив строки x столбцы) объемом около chunk_bytes."""
+    chunk_rows = max(1, chunk_bytes // (8 * max(len(columns), 1)))
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows][list(columns)].to_numpy(dtype=np.float64, na_value=np.nan)
+        yield start, _fill(chunk, medians)
+
+
+def iqr_scores(values, q1, q3):
+    """Выход за границы [Q1 - 1.5 * IQR, Q3 + 1.5 * IQR] в единицах IQR (0 - внутри границ)."""
+    iqr = q3 - q1
+    with _quiet():
+        excess = np.fmax((q1 - IQR_FACTOR * iqr) - values, values - (q3 + IQR_FACTOR * iqr))
+        scores = np.where(excess > 0, excess / (iqr if iqr > 0 else 1.0), 0.0)
+    return np.nan_to_num(scores, copy=False, nan=0.0, posinf=0.0)
+
+
+def mad_scores(values):
+    """|x - медиана| / (1.4826 * MAD); при MAD = 0 - по среднему абсолютному отклонению."""
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return np.zeros(len(values))
+    median = np.median(finite)
+    deviation = np.abs(finite - median)
+    scale = np.median(deviation) * 1.4826 or deviation.mean() * 1.2533
+    if not scale > 0:
+        return np.zeros(len(values))
+    with _quiet():
+        scores = np.abs(values - median) / scale
+    return np.nan_to_num(scores, copy=False, nan=0.0, posinf=0.0)
+
+
+def univariate_scores(df, columns, method, exact=True, rank_error=DEFAULT_RANK_ERROR, profile=None):
+    """Оценки по столбцам по одному; квартили для IQR - из профиля (точные или по скетчу)."""
+    if method == 'iqr' and profile is None:
+        profile = get_profile(df)
+    threshold = 0.0 if method == 'iqr' else MAD_THRESHOLD
+    scores = np.zeros(len(df))
+    bits, counts, bounds = [], [], []
+    for col in columns:
+        values = column_values(df, col)
+        if method == 'iqr':
+            q1, q3, lower, upper = profile.iqr_bounds(col, exact, rank_error)
+            column_scores = iqr_scores(values, q1, q3)
+            bounds.append((lower, upper))
+        else:
+            column_scores = mad_scores(values)
+        flags = column_scores > threshold
+        bits.append(np.packbits(flags))
+        counts.append(int(flags.sum()))
+        np.maximum(scores, column_scores, out=scores)
+
+    counts = pd.Series(counts, index=columns, dtype=np.int64)
+    bounds = pd.DataFrame(bounds, index=columns, columns=['lower', 'upper']) if method == 'iqr' else None
+    return AnomalyScores(method, columns, scores, threshold, np.array(bits).reshape(len(columns), -1), counts,
+                         bounds)
+
+
+def robust_covariance(sample, support=MCD_SUPPORT, steps=MCD_STEPS):
+    """Центр и ковариация по C-шагам MCD на заполненной подвыборке строк.
+
+    Старт - точки, ближайшие к покоординатной медиане в масштабе MAD; далее
+    среднее и ковариация пересчитываются по доле support ближайших точек до
+    сходимости. Ковариация масштабируется к нормальному распределению.
+    """
+    n, p = sample.shape
+    h = max(int(n * support), p + 1)
+
+    distances = sum(mad_scores(sample[:, feature]) ** 2 for feature in range(p))
+    subset = np.argpartition(distances, h - 1)[:h]
+    for _ in range(steps):
+        center = sample[subset].mean(axis=0)
+        covariance = np.atleast_2d(np.cov(sample[subset], rowvar=False))
+        distances = _squared_distances(sample, center, np.linalg.pinv(covariance))
+        new_subset = np.argpartition(distances, h - 1)[:h]
+        if np.array_equal(np.sort(new_subset), np.sort(subset)):
+            break
+        subset = new_subset
+
+    correction = np.median(distances) / stats.chi2.ppf(0.5, p)
+    return center, covariance * (correction if correction > 0 else 1.0)
+
+
+def _squared_distances(values, center, precision):
+    centered = values - center
+    return np.einsum('ij,jk,ik->i', centered, precision, centered)
+
+
+def mahalanobis_scores(df, columns, max_rows=MCD_MAX_ROWS, seed=0):
+    """Робастное расстояние Махаланобиса и порог по квантилю хи-квадрат.
+
+    Ковариация оценивается по подвыборке из max_rows строк, расстояния
+    считаются для всех строк по частям.
+    """
+    n, p = len(df), len(columns)
+    threshold = float(np.sqrt(stats.chi2.ppf(MAHALANOBIS_QUANTILE, p)))
+    if n <= p + 1:
+        return np.zeros(n), threshold
+    medians = column_medians(df, columns)
+    rng = np.random.default_rng(seed)
+    positions = np.sort(rng.choice(n, max_rows, replace=False)) if n > max_rows else np.arange(n)
+    center, covariance = robust_covariance(sample_matrix(df, columns, positions, medians))
+    precision = np.linalg.pinv(covariance)
+
+    distances = np.empty(n)
+    for start, chunk in filled_chunks(df, columns, medians):
+        distances[start:start + len(chunk)] = np.sqrt(np.maximum(_squared_distances(chunk, center, precision), 0))
+    return distances, threshold
+
+
+def _average_path(size):
+    """Средняя длина пути неудачного поиска в двоичном дереве из size элементов."""
+    if size > 2:
+        return 2 * (np.log(size - 1) + np.euler_gamma) - 2 * (size - 1) / size
+    return 1.0 if size == 2 else 0.0
+
+
+def _build_tree(sample, max_depth, rng):
+    """Изолирующее дерево в виде массивов: признак, порог, потомки и длина пути до узла.
+
+    Лист ссылается сам на себя (порог +inf), поэтому спуск можно делать
+    фиксированное число шагов без проверки, дошла ли строка до листа.
+    """
+    features, thresholds, left, right, paths = [], [], [], [], []
+    stack = [(np.arange(len(sample)), 0, None)]
+    while stack:
+        rows, depth, parent = stack.pop()
+        node = len(features)
+        if parent is not None:
+            parent_node, side = parent
+            (left if side == 0 else right)[parent_node] = node
+        features.append(0)
+        thresholds.append(np.inf)
+        left.append(node)
+        right.append(node)
+        paths.append(depth + _average_path(len(rows)))
+        if depth >= max_depth or len(rows) <= 1:
+            continue
+        values = sample[rows]
+        low, high = values.min(axis=0), values.max(axis=0)
+        splittable = np.flatnonzero(high > low)
+        if not len(splittable):
+            continue
+        feature = rng.choice(splittable)
+        threshold = rng.uniform(low[feature], high[feature])
+        features[node] = feature
+        thresholds[node] = threshold
+        goes_left = values[:, feature] < threshold
+        stack.append((rows[~goes_left], depth + 1, (node, 1)))
+        stack.append((rows[goes_left], depth + 1, (node, 0)))
+    return (np.array(features, dtype=np.intp), np.array(thresholds), np.array(left, dtype=np.intp),
+            np.array(right, dtype=np.intp), np.array(paths))
+
+
+def _path_lengths(columns, tree, max_depth):
+    """Длины путей всех строк в дереве; columns - матрица p x n (столбцы подряд в памяти).
+
+    Все строки спускаются одновременно по уровню за шаг; значения берутся
+    из плоского массива по смещению признак * n + строка.
+    """
+    features, thresholds, left, right, paths = tree
+    n = columns.shape[1]
+    flat = columns.ravel()
+    offsets = features * n
+    rows = np.arange(n)
+    node = np.zeros(n, dtype=np.intp)
+    for _ in range(max_depth):
+        goes_left = flat.take(offsets.take(node) + rows) < thresholds.take(node)
+        node = np.where(goes_left, left.take(node), right.take(node))
+    return paths.take(node)
+
+
+def isolation_scores(df, columns, trees=ISOLATION_TREES, sample_size=ISOLATION_SAMPLE, seed=0):
+    """Оценка изолирующего леса 2^(-E[h] / c(sample_size)); близкие к 1 - аномалии.
+
+    Каждое дерево строится на случайной подвыборке из sample_size строк,
+    поэтому обучение не зависит от размера таблицы, а оценка - векторный
+    спуск всех строк очередной части таблицы по деревьям.
+    """
+    n = len(df)
+    medians = column_medians(df, columns)
+    rng = np.random.default_rng(seed)
+    sample_size = min(sample_size, n)
+    max_depth = int(np.ceil(np.log2(max(sample_size, 2))))
+    forest = [_build_tree(sample_matrix(df, columns, rng.choice(n, sample_size, replace=False), medians),
+                          max_depth, rng) for _ in range(trees)]
+
+    total = np.zeros(n)
+    for start, chunk in filled_chunks(df, columns, medians):
+        chunk_columns = np.ascontiguousarray(chunk.T)
+        for tree in forest:
+            total[start:start + len(chunk)] += _path_lengths(chunk_columns, tree, max_depth)
+    normalizer = _average_path(sample_size)
+    return 2 ** (-(total / trees) / normalizer) if normalizer > 0 else np.zeros(n)
+
+
+def score_anomalies(df, columns, method, exact=True, rank_error=DEFAULT_RANK_ERROR, profile=None):
+    if method in UNIVARIATE_METHODS:
+        return univariate_scores(df, columns, method, exact, rank_error, profile)
+    if method == 'mahalanobis':
+        scores, threshold = mahalanobis_scores(df, columns)
+        return AnomalyScores(method, columns, scores, threshold)
+    return AnomalyScores(method, columns, isolation_scores(df, columns), ISOLATION_THRESHOLD)
+
+
+def anomaly_scores(df, columns, method='iqr', exact=True, rank_error=DEFAULT_RANK_ERROR, profile=None):
+    """Оценки методом method по столбцам columns, вычисляемые один раз на набор данных.
+
+    exact и rank_error задают квартили для метода IQR, как в DataProfile.iqr_bounds;
+    profile - уже построенный профиль df (по умолчанию get_profile(df)).
+    """
+    columns = pd.Index(columns)
+    quantiles = (exact, rank_error) if method == 'iqr' else ()
+    return memoize(df, ('anomalies', method, tuple(columns)) + quantiles,
+                   lambda: score_anomalies(df, columns, method, exact, rank_error, profile))
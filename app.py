@@ -10,6 +10,27 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import time
 
+from correlation import correlation_subset
+from data_profile import DEFAULT_RANK_ERROR, get_profile
+from datetimes import RESAMPLE_AGGREGATIONS, RESAMPLE_RULES, cached_time_series, rolling_label
+from downsampling import DEFAULT_MAX_POINTS, SAMPLING_METHODS, annotate_sampling, downsample_frame
+from duplicates import GROUP_PREVIEW
+from figure_aggregates import (PAIR_BINS, box_figure, column_box_stats, column_histogram, column_kde,
+                               histogram_figure, pair_density_figure, pair_histograms, violin_figure)
+from group_aggregates import OTHER_LABEL, TOP_CATEGORIES, cached_bucketed_box_stats, cached_group_statistics
+from anomalies import ANOMALY_METHODS, UNIVARIATE_METHODS, anomaly_scores
+from columnar import DATA_DIR, data_file_path, is_columnar, list_data_files, read_schema
+from excel import is_excel, list_sheets
+from exports import EXPORT_FORMATS, available_formats, export_file, export_name
+from instrumentation import span, start_trace, stop_trace, traced
+from loader import SUPPORTED_EXTENSIONS, load_local_file, load_uploaded_file
+from memo import get_memo
+from registry import RegistryHolder, get_registry
+from report import (STATS_LABELS, format_with_error, insights, metadata_table, missing_table, quality_checks,
+                    quality_table, recommendations, summary_table, text_report)
+from streaming import DEFAULT_CHUNK_ROWS, profile_uploaded_csv
+from trendlines import add_lowess_trace, add_ols_trace, cached_lowess, cached_ols
+
 warnings.filterwarnings('ignore')
 
 st.set_page_config(
@@ -145,46 +166,113 @@ create_animated_header()
 st.markdown("### Система первичного анализа и верификации данных")
 
 
-def basic_data_info(df):
+def quantile_options():
+    """Настройки расчета квантилей из боковой панели."""
+    return {
+        'exact': st.session_state.get('exact_quantiles', False),
+        'rank_error': st.session_state.get('quantile_rank_error', DEFAULT_RANK_ERROR)
+    }
+
+
+def count_options():
+    """Настройки подсчета уникальных и частых значений из боковой панели."""
+    return {'exact': st.session_state.get('exact_counts', False)}
+
+
+def plot_options():
+    """Настройки прореживания точек и отрисовки графиков из боковой панели."""
+    return {
+        'max_points': st.session_state.get('plot_max_points', DEFAULT_MAX_POINTS),
+        'method': st.session_state.get('plot_sampling_method', 'auto')
+    }
+
+
+def scatter_render_mode():
+    return 'webgl' if st.session_state.get('plot_webgl', True) else 'svg'
+
+
+def plotly_chart(fig, **kwargs):
+    """st.plotly_chart с замером сериализации фигуры в режиме профилирования."""
+    points = sum(len(trace.x) for trace in fig.data if getattr(trace, 'x', None) is not None)
+    with span('plotly_chart', rows=points):
+        st.plotly_chart(fig, **kwargs)
+
+
+def column_quartiles(profile, col):
+    return profile.numeric_summary(**quantile_options()).loc[['25%', '50%', '75%'], col]
+
+
+NUMERIC_TABS = ["📈 Распределения", "📊 Сравнение", "🔄 Корреляции", "📋 Статистика"]
+CATEGORICAL_TABS = ["📊 Основные графики", "🎯 Детальный анализ", "📈 Сравнение"]
+EXPORT_TABS = ["📈 Визуальный отчет", "📋 Статистический отчет", "🔍 Детальный анализ", "📤 Экспорт данных"]
+
+
+def section_tabs(labels, key):
+    """Переключатель вкладок раздела.
+
+    В отличие от st.tabs, содержимое скрытых вкладок не вычисляется: функция
+    возвращает выбранную вкладку, и раздел строит только ее.
+    """
+    return st.radio("Вкладка", labels, horizontal=True, key=key, label_visibility='collapsed')
+
+
+@traced
+def basic_data_info(df, profile=None):
+    profile = get_profile(df) if profile is None else profile
     st.markdown('<div class="section-header">Базовые характеристики данных</div>', unsafe_allow_html=True)
 
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Объем данных", f"{df.shape[0]:,}", "наблюдений")
+        st.metric("Объем данных", f"{profile.n_rows:,}", "наблюдений")
         st.markdown('</div>', unsafe_allow_html=True)
 
     with col2:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Переменные", f"{df.shape[1]:,}", "столбцов")
+        st.metric("Переменные", f"{profile.n_cols:,}", "столбцов")
         st.markdown('</div>', unsafe_allow_html=True)
 
     with col3:
-        numeric_cols = df.select_dtypes(include=[np.number]).shape[1]
+        numeric_cols = len(profile.numeric_cols)
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
         st.metric("Числовые данные", f"{numeric_cols:,}", "переменных")
         st.markdown('</div>', unsafe_allow_html=True)
 
     with col4:
-        categorical_cols = df.select_dtypes(include=['object']).shape[1]
+        categorical_cols = len(profile.categorical_cols)
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
         st.metric("Категориальные данные", f"{categorical_cols:,}", "переменных")
         st.markdown('</div>', unsafe_allow_html=True)
 
+    memory_before = df.attrs.get('memory_before')
+    if memory_before is not None:
+        memory_after = profile.memory_bytes
+        st.metric("Память", f"{memory_after / 1024 ** 2:,.1f} МБ",
+                  f"{(memory_after - memory_before) / 1024 ** 2:,.1f} МБ после оптимизации типов",
+                  delta_color="inverse")
+        dtype_report = get_memo().peek(df.attrs.get('dataset_key'), 'dtype_report')
+        if dtype_report is not None:
+            with st.expander("Изменения типов данных"):
+                st.dataframe(dtype_report, use_container_width=True)
+
+    datetime_formats = df.attrs.get('datetime_formats')
+    if datetime_formats:
+        st.caption("Распознаны даты: " + ", ".join(f"{col} ({fmt})" for col, fmt in datetime_formats.items()))
+
     st.subheader("Структура и метаданные")
-    info_df = pd.DataFrame({
-        'Переменная': df.columns,
-        'Тип данных': df.dtypes,
-        'Уникальные значения': df.nunique(),
-        'Пропущенные значения': df.isnull().sum(),
-        'Доля пропусков, %': (df.isnull().sum() / len(df) * 100).round(2)
-    })
+    info_df = profile.info_frame(**count_options())
     st.dataframe(info_df, use_container_width=True, height=400)
 
+    if profile.task_timings:
+        with st.expander("⏱️ Время расчета профиля"):
+            st.dataframe(profile.timing_summary().round(4), use_container_width=True)
+
 
+@traced
 def numeric_analysis(df):
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    profile = get_profile(df)
+    numeric_cols = profile.numeric_cols
     if len(numeric_cols) == 0:
         st.markdown('<div class="warning-box">Числовые переменные для анализа отсутствуют</div>',
                     unsafe_allow_html=True)
@@ -193,7 +281,7 @@ def numeric_analysis(df):
     st.markdown('<div class="section-header">Анализ числовых переменных</div>', unsafe_allow_html=True)
 
     st.subheader("Статистические показатели")
-    desc_stats = df[numeric_cols].describe()
+    desc_stats = profile.numeric_summary(**quantile_options())
 
     desc_stats_ru = desc_stats.rename(index={
         'count': 'Количество',
@@ -243,15 +331,17 @@ def numeric_analysis(df):
         if len(selected_cols) > 1:
             st.write("**Матрица корреляций**")
             fig, ax = plt.subplots(figsize=(10, 8))
-            correlation_matrix = df[selected_cols].corr()
+            correlation_matrix = correlation_subset(df, numeric_cols, selected_cols)
             sns.heatmap(correlation_matrix, annot=True, cmap='RdBu_r', center=0,
                         fmt='.2f', ax=ax, cbar_kws={'label': 'Коэффициент корреляции'})
             ax.set_title('Матрица корреляций между переменными')
             st.pyplot(fig)
 
 
+@traced
 def categorical_analysis(df):
-    categorical_cols = df.select_dtypes(include=['object']).columns
+    profile = get_profile(df)
+    categorical_cols = profile.categorical_cols
     if len(categorical_cols) == 0:
         st.markdown('<div class="warning-box">⚠️ Категориальные переменные для анализа отсутствуют</div>',
                     unsafe_allow_html=True)
@@ -266,7 +356,8 @@ def categorical_analysis(df):
     )
 
     if selected_cat_col:
-        value_counts = df[selected_cat_col].value_counts().head(15)
+        top_values = profile.top_values(selected_cat_col, 15, **count_options())
+        value_counts = top_values['count']
 
         col1, col2 = st.columns([2, 1])
 
@@ -289,7 +380,7 @@ def categorical_analysis(df):
 
             fig.update_traces(texttemplate='%{y}', textposition='outside')
 
-            st.plotly_chart(fig, use_container_width=True)
+            plotly_chart(fig, use_container_width=True)
 
         with col2:
             st.write("**📈 Статистика распределения**")
@@ -298,6 +389,8 @@ def categorical_analysis(df):
                 'Абсолютная частота': value_counts.values,
                 'Относительная частота, %': (value_counts.values / len(df) * 100).round(2)
             })
+            if top_values['error'].any():
+                freq_table['Погрешность, ±'] = top_values['error'].values
 
             styled_freq_table = freq_table.style.background_gradient(
                 subset=['Абсолютная частота'],
@@ -310,7 +403,8 @@ def categorical_analysis(df):
 
             col_a, col_b = st.columns(2)
             with col_a:
-                st.metric("Всего категорий", f"{df[selected_cat_col].nunique()}")
+                nunique, error = profile.distinct_counts(**count_options()).loc[selected_cat_col]
+                st.metric("Всего категорий", format_with_error(nunique, error))
             with col_b:
                 st.metric("Наиболее частая", value_counts.index[0])
 
@@ -318,26 +412,22 @@ def categorical_analysis(df):
                       f"{(value_counts.values[0] / len(df) * 100):.1f}%")
 
 
-def missing_values_analysis(df):
-    missing_total = df.isnull().sum().sum()
-    if missing_total == 0:
+@traced
+def missing_values_analysis(df, profile=None):
+    profile = get_profile(df) if profile is None else profile
+    if profile.missing_total == 0:
         st.markdown('<div class="success-box">Пропущенные значения в данных отсутствуют</div>', unsafe_allow_html=True)
         return
 
     st.markdown('<div class="section-header">Анализ пропущенных значений</div>', unsafe_allow_html=True)
 
-    missing_series = df.isnull().sum()
-    missing_series = missing_series[missing_series > 0]
+    missing_series = profile.null_counts[profile.null_counts > 0]
 
     col1, col2 = st.columns(2)
 
     with col1:
         st.write("**Детализация пропусков по переменным**")
-        missing_df = pd.DataFrame({
-            'Переменная': missing_series.index,
-            'Количество пропусков': missing_series.values,
-            'Доля пропусков, %': (missing_series.values / len(df) * 100).round(2)
-        }).sort_values('Количество пропусков', ascending=False)
+        missing_df = missing_table(profile)
 
         st.dataframe(missing_df, use_container_width=True)
 
@@ -352,31 +442,44 @@ def missing_values_analysis(df):
         ax.grid(True, alpha=0.3)
         st.pyplot(fig)
 
+    if profile.nullity is not None:
+        missing_patterns(profile.nullity)
+
+
+def missing_patterns(nullity):
+    """Совместная пропущенность, частые шаблоны и карта пропусков по упакованной маске."""
+    co_missing = nullity.co_missingness()
+    if len(co_missing) >= 2:
+        st.write("**Совместная пропущенность** (корреляция индикаторов пропуска)")
+        fig_co = px.imshow(co_missing, text_auto='.2f', zmin=-1, zmax=1, color_continuous_scale='RdBu_r',
+                           aspect='auto')
+        fig_co.update_layout(height=max(300, 40 * len(co_missing)))
+        plotly_chart(fig_co, use_container_width=True)
+
+    patterns, total_patterns = nullity.patterns()
+    st.write(f"**Частые шаблоны пропусков** (всего различных шаблонов: {total_patterns:,})")
+    flags = patterns.columns[:-2]
+    st.dataframe(patterns.assign(**{col: patterns[col].map({True: '✗', False: ''}) for col in flags}),
+                 use_container_width=True, hide_index=True)
+
+    st.write("**Карта пропусков**")
+    start, stop = st.slider("Диапазон строк:", min_value=0, max_value=nullity.n_rows,
+                            value=(0, nullity.n_rows), key='nullity_rows')
+    heatmap = nullity.heatmap(start, stop)
+    if heatmap.empty:
+        return
+    fig_map = px.imshow(heatmap.T, zmin=0, zmax=1, color_continuous_scale='Reds', aspect='auto',
+                        labels=dict(x='Строка', y='Переменная', color='Доля пропусков'))
+    fig_map.update_layout(height=max(300, 25 * len(heatmap.columns)))
+    plotly_chart(fig_map, use_container_width=True)
 
-def data_quality_checks(df):
-    st.markdown('<div class="section-header">Диагностика качества данных</div>', unsafe_allow_html=True)
-
-    issues = []
-    warnings_list = []
-    info_list = []
-
-    duplicates = df.duplicated().sum()
-    if duplicates > 0:
-        warnings_list.append(f"Обнаружено полных дубликатов записей: {duplicates}")
-
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
-    for col in numeric_cols:
-        if np.isinf(df[col]).sum() > 0:
-            warnings_list.append(f"Обнаружены бесконечные значения в переменной: '{col}'")
 
-    for col in df.columns:
-        if df[col].nunique() == 1:
-            info_list.append(f"Переменная '{col}' содержит постоянное значение")
+@traced
+def data_quality_checks(df, profile=None):
+    st.markdown('<div class="section-header">Диагностика качества данных</div>', unsafe_allow_html=True)
 
-    for col in df.columns:
-        missing_percent = (df[col].isnull().sum() / len(df)) * 100
-        if missing_percent > 50:
-            warnings_list.append(f"Критический уровень пропусков в переменной '{col}': {missing_percent:.1f}%")
+    profile = get_profile(df) if profile is None else profile
+    warnings_list, info_list = quality_checks(profile, exact_counts=count_options()['exact'])
 
     if warnings_list:
         st.markdown('<div class="warning-box">', unsafe_allow_html=True)
@@ -394,9 +497,53 @@ def data_quality_checks(df):
         st.markdown('<div class="success-box">Качество данных соответствует требованиям для анализа</div>',
                     unsafe_allow_html=True)
 
+    duplicate_groups_view(profile, profile.duplicate_index, key='full')
+    if profile.duplicate_index.verified:
+        near_duplicates_view(profile)
+
+
+def duplicate_groups_view(profile, index, key):
+    """Крупнейшие группы дубликатов и строки выбранной группы (если строки доступны)."""
+    if index.count == 0:
+        return
+    st.write(f"**Группы дубликатов:** {index.n_groups:,}, строк в них: {index.duplicated_rows:,}")
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        st.dataframe(index.groups_frame(), use_container_width=True, hide_index=True)
+    with col2:
+        if index.verified:
+            group = st.selectbox("Строки группы:", range(min(GROUP_PREVIEW, index.n_groups)),
+                                 format_func=lambda group: f"Группа {group + 1} ({index.group_sizes[group]} строк)",
+                                 key=f'duplicate_group_{key}')
+            st.dataframe(profile.duplicate_rows(index, group).head(GROUP_PREVIEW), use_container_width=True)
+        else:
+            st.dataframe(index.size_distribution(), use_container_width=True)
+
 
+def near_duplicates_view(profile):
+    """Поиск почти-дубликатов по выбранным столбцам с нормализацией значений."""
+    with st.expander("🔁 Почти-дубликаты по выбранным столбцам"):
+        columns = st.multiselect("Сравнивать столбцы:", profile.columns.tolist(), key='near_duplicate_columns')
+        col1, col2 = st.columns(2)
+        with col1:
+            normalize_text = st.checkbox("Без учета регистра и пробелов в тексте", value=True,
+                                         key='near_duplicate_text')
+        with col2:
+            round_digits = st.number_input("Округлять дробные числа до знаков (-1 - не округлять):",
+                                           min_value=-1, max_value=10, value=-1, step=1,
+                                           key='near_duplicate_digits')
+        if not columns:
+            st.info("Выберите столбцы, по которым строки считаются одинаковыми")
+            return
+        index = profile.near_duplicates(columns, normalize_text, None if round_digits < 0 else int(round_digits))
+        st.metric("Почти-дубликатов", f"{index.count:,}", f"групп: {index.n_groups:,}", delta_color="off")
+        duplicate_groups_view(profile, index, key='near')
+
+
+@traced
 def enhanced_numeric_analysis(df):
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    profile = get_profile(df)
+    numeric_cols = profile.numeric_cols
     if len(numeric_cols) == 0:
         st.markdown('<div class="warning-box">Числовые переменные для анализа отсутствуют</div>',
                     unsafe_allow_html=True)
@@ -414,19 +561,20 @@ def enhanced_numeric_analysis(df):
     if not selected_cols:
         return
 
-    tab1, tab2, tab3, tab4 = st.tabs(["📈 Распределения", "📊 Сравнение", "🔄 Корреляции", "📋 Статистика"])
+    tab1, tab2, tab3, tab4 = NUMERIC_TABS
+    active_tab = section_tabs(NUMERIC_TABS, key='numeric_tab')
 
-    with tab1:
+    if active_tab == tab1:
 
         st.subheader("Распределения с плотностью вероятности")
         cols = st.columns(2)
         for i, col in enumerate(selected_cols):
             with cols[i % 2]:
-                fig = px.histogram(df, x=col, nbins=30,
-                                   title=f'📊 {col} - Распределение',
-                                   color_discrete_sequence=['#1f77b4'],
-                                   opacity=0.7,
-                                   marginal="box")
+                fig = histogram_figure(column_histogram(df, col, 30), col,
+                                       title=f'📊 {col} - Распределение',
+                                       color='#1f77b4',
+                                       opacity=0.7,
+                                       box=column_box_stats(df, col, column_quartiles(profile, col)))
 
                 fig.update_layout(
                     height=400,
@@ -435,54 +583,57 @@ def enhanced_numeric_analysis(df):
                     font=dict(size=12),
                     title_font=dict(size=14)
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                plotly_chart(fig, use_container_width=True)
 
-    with tab2:
+    elif active_tab == tab2:
 
         st.subheader("Анализ выбросов и распределений")
         col1, col2 = st.columns(2)
 
         with col1:
-            fig_box = px.box(df, y=selected_cols,
-                             title='📦 Диаграммы размаха',
-                             color_discrete_sequence=['#ff7f0e'])
+            box_stats_by_col = {col: column_box_stats(df, col, column_quartiles(profile, col))
+                                for col in selected_cols}
+            fig_box = box_figure(box_stats_by_col,
+                                 title='📦 Диаграммы размаха',
+                                 color='#ff7f0e')
             fig_box.update_layout(height=500, template='plotly_white')
-            st.plotly_chart(fig_box, use_container_width=True)
+            plotly_chart(fig_box, use_container_width=True)
 
         with col2:
             if len(selected_cols) <= 4:
-                fig_violin = px.violin(df, y=selected_cols,
-                                       title='🎻 Violin plot (плотность распределения)',
-                                       box=True,
-                                       color_discrete_sequence=['#2ca02c'])
+                kde_by_col = {}
+                for col in selected_cols:
+                    q1, _, q3 = column_quartiles(profile, col)
+                    kde_by_col[col] = column_kde(df, col, iqr=q3 - q1)
+                fig_violin = violin_figure(kde_by_col, box_stats_by_col,
+                                           title='🎻 Violin plot (плотность распределения)',
+                                           color='#2ca02c')
                 fig_violin.update_layout(height=500, template='plotly_white')
-                st.plotly_chart(fig_violin, use_container_width=True)
+                plotly_chart(fig_violin, use_container_width=True)
 
-    with tab3:
+    elif active_tab == tab3:
 
         st.subheader("Анализ взаимосвязей")
 
         if len(selected_cols) > 1:
-            col1, col2 = st.columns([2, 1])
-
-            with col1:
-
-                corr_matrix = df[selected_cols].corr()
-                fig_heatmap = px.imshow(corr_matrix,
-                                        title='🔥 Тепловая карта корреляций',
-                                        color_continuous_scale='RdBu_r',
-                                        aspect='auto',
-                                        text_auto=True)
-                fig_heatmap.update_layout(height=500)
-                st.plotly_chart(fig_heatmap, use_container_width=True)
-
-            with col2:
-
-                if len(selected_cols) <= 5:
-                    fig_scatter_matrix = px.scatter_matrix(df[selected_cols],
-                                                           title='🔄 Матрица scatter plot',
-                                                           height=600)
-                    st.plotly_chart(fig_scatter_matrix, use_container_width=True)
+            corr_method = st.radio("Метод корреляции:", ["pearson", "spearman"],
+                                   format_func={'pearson': 'Пирсон', 'spearman': 'Спирмен'}.get,
+                                   horizontal=True)
+            corr_matrix = correlation_subset(df, numeric_cols, selected_cols, corr_method)
+            fig_heatmap = px.imshow(corr_matrix,
+                                    title='🔥 Тепловая карта корреляций',
+                                    color_continuous_scale='RdBu_r',
+                                    aspect='auto',
+                                    text_auto=True)
+            fig_heatmap.update_layout(height=500)
+            plotly_chart(fig_heatmap, use_container_width=True)
+
+            st.subheader("Матрица плотности пар")
+            pair_bins = st.slider("Интервалов по каждой оси:", 10, 100, PAIR_BINS, step=10, key='pair_bins')
+            fig_pairs = pair_density_figure(pair_histograms(df, selected_cols, pair_bins),
+                                            title='🔄 Двумерные гистограммы пар столбцов')
+            fig_pairs.update_layout(height=min(1400, max(500, 180 * len(selected_cols))), template='plotly_white')
+            plotly_chart(fig_pairs, use_container_width=True)
 
         if len(selected_cols) >= 2:
             st.subheader("Диаграмма рассеяния")
@@ -495,21 +646,24 @@ def enhanced_numeric_analysis(df):
             with scatter_col3:
                 color_by = st.selectbox("Цвет по:", ["Нет"] + selected_cols)
 
-            fig_scatter = px.scatter(df, x=x_axis, y=y_axis,
-                                     color=color_by if color_by != "Нет" else None,
+            color_col = color_by if color_by != "Нет" else None
+            plot_data, total_points = downsample_frame(df, y_axis, x=x_axis, strata_col=color_col,
+                                                       **plot_options())
+            fig_scatter = px.scatter(plot_data, x=x_axis, y=y_axis,
+                                     color=color_col,
                                      title=f'📊 {x_axis} vs {y_axis}',
-                                     trendline="lowess",
-                                     opacity=0.6)
+                                     opacity=0.6,
+                                     render_mode=scatter_render_mode())
+            add_lowess_trace(fig_scatter, cached_lowess(df, x_axis, y_axis))
             fig_scatter.update_layout(height=500, template='plotly_white')
-            st.plotly_chart(fig_scatter, use_container_width=True)
+            annotate_sampling(fig_scatter, len(plot_data), total_points)
+            plotly_chart(fig_scatter, use_container_width=True)
 
-    with tab4:
+    else:
 
         st.subheader("Детальная статистика")
 
-        desc_stats = df[selected_cols].describe().T
-        desc_stats['skewness'] = df[selected_cols].skew()
-        desc_stats['kurtosis'] = df[selected_cols].kurtosis()
+        desc_stats = profile.numeric_stats(selected_cols, **quantile_options())
         desc_stats_ru = desc_stats.rename(columns={
             'count': 'Количество',
             'mean': 'Среднее',
@@ -527,8 +681,10 @@ def enhanced_numeric_analysis(df):
                      use_container_width=True)
 
 
+@traced
 def enhanced_categorical_analysis(df):
-    categorical_cols = df.select_dtypes(include=['object']).columns
+    profile = get_profile(df)
+    categorical_cols = profile.categorical_cols
     if len(categorical_cols) == 0:
         st.markdown('<div class="warning-box">⚠️ Категориальные переменные для анализа отсутствуют</div>',
                     unsafe_allow_html=True)
@@ -546,11 +702,16 @@ def enhanced_categorical_analysis(df):
     if not selected_cat_col:
         return
 
-    value_counts = df[selected_cat_col].value_counts().head(15)
+    top_values = profile.top_values(selected_cat_col, 15, **count_options())
+    value_counts = top_values['count']
+    if top_values['error'].any():
+        st.caption(f"Частоты категорий оценены приближенно, максимальная погрешность "
+                   f"± {top_values['error'].max():,} наблюдений")
 
-    tab1, tab2, tab3 = st.tabs(["📊 Основные графики", "🎯 Детальный анализ", "📈 Сравнение"])
+    tab1, tab2, tab3 = CATEGORICAL_TABS
+    active_tab = section_tabs(CATEGORICAL_TABS, key='categorical_tab')
 
-    with tab1:
+    if active_tab == tab1:
         col1, col2 = st.columns([2, 1])
 
         with col1:
@@ -560,7 +721,7 @@ def enhanced_categorical_analysis(df):
                              color_discrete_sequence=px.colors.sequential.Viridis)
             fig_pie.update_traces(textposition='inside', textinfo='percent+label')
             fig_pie.update_layout(height=500, showlegend=False)
-            st.plotly_chart(fig_pie, use_container_width=True)
+            plotly_chart(fig_pie, use_container_width=True)
 
         with col2:
             fig_bar_h = px.bar(x=value_counts.values,
@@ -572,9 +733,9 @@ def enhanced_categorical_analysis(df):
             fig_bar_h.update_layout(height=500, showlegend=False,
                                     xaxis_title="Количество",
                                     yaxis_title="Категории")
-            st.plotly_chart(fig_bar_h, use_container_width=True)
+            plotly_chart(fig_bar_h, use_container_width=True)
 
-    with tab2:
+    elif active_tab == tab2:
 
         if len(value_counts) > 5:
             fig_treemap = px.treemap(names=value_counts.index,
@@ -582,7 +743,7 @@ def enhanced_categorical_analysis(df):
                                      values=value_counts.values,
                                      title='🗺️ Treemap распределения')
             fig_treemap.update_layout(height=500)
-            st.plotly_chart(fig_treemap, use_container_width=True)
+            plotly_chart(fig_treemap, use_container_width=True)
 
         if len(value_counts) >= 8:
             fig_sunburst = px.sunburst(names=value_counts.index,
@@ -590,28 +751,35 @@ def enhanced_categorical_analysis(df):
                                        values=value_counts.values,
                                        title='☀️ Sunburst диаграмма')
             fig_sunburst.update_layout(height=500)
-            st.plotly_chart(fig_sunburst, use_container_width=True)
+            plotly_chart(fig_sunburst, use_container_width=True)
 
-    with tab3:
+    else:
 
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
+        numeric_cols = profile.numeric_cols
         if len(numeric_cols) > 0:
             compare_with = st.selectbox("Сравнить с числовой переменной:",
                                         numeric_cols.tolist())
 
             if compare_with:
+                top_n = st.slider("Категорий на графиках:", min_value=5, max_value=50, value=TOP_CATEGORIES,
+                                  key='group_top_n', help=f"Остальные категории объединяются в группу «{OTHER_LABEL}»")
+                boxes = cached_bucketed_box_stats(df, selected_cat_col, compare_with, top_n)
+                # Статистики по всем числовым столбцам - одна группировка на категориальный столбец;
+                # смена сравниваемого столбца берет готовую таблицу из кэша
+                group_stats = cached_group_statistics(df, selected_cat_col, numeric_cols).column(compare_with)
                 col1, col2 = st.columns(2)
 
                 with col1:
-                    fig_box_cat = px.box(df, x=selected_cat_col, y=compare_with,
-                                         title=f'📦 {compare_with} по категориям')
+                    fig_box_cat = box_figure(boxes, f'📦 {compare_with} по категориям')
                     fig_box_cat.update_layout(height=500,
                                               xaxis_tickangle=-45,
+                                              xaxis_title=selected_cat_col,
+                                              yaxis_title=compare_with,
                                               template='plotly_white')
-                    st.plotly_chart(fig_box_cat, use_container_width=True)
+                    plotly_chart(fig_box_cat, use_container_width=True)
 
                 with col2:
-                    avg_by_cat = df.groupby(selected_cat_col)[compare_with].mean().sort_values(ascending=False).head(10)
+                    avg_by_cat = group_stats['mean'].sort_values(ascending=False).head(10)
                     fig_bar_avg = px.bar(x=avg_by_cat.index, y=avg_by_cat.values,
                                          title=f'📊 Среднее {compare_with} по категориям',
                                          color=avg_by_cat.values,
@@ -619,9 +787,14 @@ def enhanced_categorical_analysis(df):
                     fig_bar_avg.update_layout(height=500,
                                               xaxis_tickangle=-45,
                                               showlegend=False)
-                    st.plotly_chart(fig_bar_avg, use_container_width=True)
+                    plotly_chart(fig_bar_avg, use_container_width=True)
 
+                with st.expander("Статистики по всем категориям"):
+                    st.dataframe(group_stats.rename(columns=STATS_LABELS),
+                                 use_container_width=True)
 
+
+@traced
 def create_advanced_dashboard(df):
     st.markdown('<div class="section-header">🚀 Продвинутая аналитика</div>', unsafe_allow_html=True)
 
@@ -643,21 +816,22 @@ def create_advanced_dashboard(df):
         create_summary_dashboard(df)
 
 
+@traced
 def create_overview_dashboard(df):
     col1, col2 = st.columns(2)
 
     with col1:
 
-        type_counts = df.dtypes.value_counts()
+        type_counts = get_profile(df).dtype_counts
         fig_types = px.pie(values=type_counts.values,
                            names=type_counts.index.astype(str),
                            title='📊 Распределение типов данных',
                            color_discrete_sequence=px.colors.qualitative.Set3)
-        st.plotly_chart(fig_types, use_container_width=True)
+        plotly_chart(fig_types, use_container_width=True)
 
     with col2:
 
-        missing_data = df.isnull().sum()
+        missing_data = get_profile(df).null_counts
         if missing_data.sum() > 0:
             missing_data = missing_data[missing_data > 0]
             fig_missing = px.bar(x=missing_data.index, y=missing_data.values,
@@ -665,14 +839,23 @@ def create_overview_dashboard(df):
                                  color=missing_data.values,
                                  color_continuous_scale='Reds')
             fig_missing.update_layout(xaxis_tickangle=-45)
-            st.plotly_chart(fig_missing, use_container_width=True)
+            plotly_chart(fig_missing, use_container_width=True)
         else:
             st.success("✅ Пропущенные значения отсутствуют")
 
 
+@traced
 def create_trends_dashboard(df):
     """Панель анализа трендов"""
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    profile = get_profile(df)
+    numeric_cols = profile.numeric_cols
+
+    if len(profile.datetime_cols) > 0 and len(numeric_cols) > 0:
+        mode = st.radio("Режим:", ["📅 Временной ряд", "🔀 Зависимость переменных"], horizontal=True,
+                        key='trend_mode')
+        if mode == "📅 Временной ряд":
+            time_series_dashboard(df, profile)
+            return
 
     if len(numeric_cols) >= 2:
         col1, col2 = st.columns(2)
@@ -682,103 +865,177 @@ def create_trends_dashboard(df):
         with col2:
             y_col = st.selectbox("Ось Y для тренда:", numeric_cols)
 
-        fig_trend = px.scatter(df, x=x_col, y=y_col,
-                               trendline="ols",
+        plot_data, total_points = downsample_frame(df, y_col, x=x_col, **plot_options())
+        fig_trend = px.scatter(plot_data, x=x_col, y=y_col,
                                title=f'📈 Тренд: {x_col} vs {y_col}',
-                               opacity=0.6)
+                               opacity=0.6,
+                               render_mode=scatter_render_mode())
+        add_ols_trace(fig_trend, cached_ols(df, x_col, y_col))
         fig_trend.update_layout(height=500)
-        st.plotly_chart(fig_trend, use_container_width=True)
+        annotate_sampling(fig_trend, len(plot_data), total_points)
+        plotly_chart(fig_trend, use_container_width=True)
 
 
+def time_series_dashboard(df, profile):
+    """Ряд по столбцу с датами: агрегация по часам/дням/неделям, скользящее среднее и прореживание min/max."""
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        time_col = st.selectbox("Время:", profile.datetime_cols.tolist(), key='ts_time_col')
+    with col2:
+        value_col = st.selectbox("Показатель:", profile.numeric_cols.tolist(), key='ts_value_col')
+    with col3:
+        rule = st.selectbox("Шаг агрегации:", list(RESAMPLE_RULES), format_func=RESAMPLE_RULES.get,
+                            index=list(RESAMPLE_RULES).index('D'), key='ts_rule')
+    with col4:
+        aggregation = st.selectbox("Агрегат:", list(RESAMPLE_AGGREGATIONS), format_func=RESAMPLE_AGGREGATIONS.get,
+                                   key='ts_aggregation', disabled=rule == 'raw')
+    with col5:
+        window = st.number_input("Скользящее окно, точек:", min_value=0, max_value=10_000, value=0, step=1,
+                                 key='ts_window', help="0 - без скользящего среднего")
+
+    series = cached_time_series(df, time_col, value_col, rule, aggregation, int(window) or None)
+    if series.empty:
+        st.info("Нет значений для построения ряда")
+        return
+
+    # Пики и провалы сохраняются при любом числе точек в ряду
+    max_points = plot_options()['max_points']
+    plot_data, total_points = downsample_frame(series, value_col, x=time_col, max_points=max_points,
+                                               method='minmax', ordered=True)
+    fig_series = px.line(plot_data, x=time_col, y=value_col, title=f'📅 {value_col} по времени',
+                         render_mode=scatter_render_mode())
+    if window:
+        label = rolling_label(int(window))
+        rolling_data, _ = downsample_frame(series, label, x=time_col, max_points=max_points,
+                                           method='minmax', ordered=True)
+        line_trace = go.Scattergl if scatter_render_mode() == 'webgl' else go.Scatter
+        fig_series.add_trace(line_trace(x=rolling_data[time_col], y=rolling_data[label], mode='lines',
+                                        name=label, line=dict(color='#d62728', width=2)))
+    fig_series.update_layout(height=500)
+    annotate_sampling(fig_series, len(plot_data), total_points)
+    plotly_chart(fig_series, use_container_width=True)
+
+
+@traced
 def create_anomalies_dashboard(df):
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    profile = get_profile(df)
+    numeric_cols = profile.numeric_cols
 
     if len(numeric_cols) > 0:
-        selected_col = st.selectbox("Выберите переменную для анализа аномалий:", numeric_cols)
-
-        Q1 = df[selected_col].quantile(0.25)
-        Q3 = df[selected_col].quantile(0.75)
-        IQR = Q3 - Q1
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
+        col1, col2 = st.columns(2)
+        with col1:
+            method = st.selectbox("Метод поиска аномалий:", list(ANOMALY_METHODS), format_func=ANOMALY_METHODS.get,
+                                  key='anomaly_method')
+        with col2:
+            selected_col = st.selectbox("Выберите переменную для анализа аномалий:", numeric_cols)
 
-        anomalies = df[(df[selected_col] < lower_bound) | (df[selected_col] > upper_bound)]
+        # Оценки считаются сразу по всем числовым столбцам и кэшируются - смена столбца только перерисовывает
+        scores = anomaly_scores(df, numeric_cols, method, **quantile_options())
+        is_anomaly = scores.column_flags(selected_col)
+        anomalies_count = int(is_anomaly.sum())
 
         col1, col2 = st.columns(2)
 
         with col1:
             st.metric("Всего наблюдений", len(df))
-            st.metric("Аномалий обнаружено", len(anomalies))
+            st.metric("Аномалий обнаружено", anomalies_count)
 
         with col2:
-            st.metric("Доля аномалий", f"{(len(anomalies) / len(df) * 100):.2f}%")
-            st.metric("Границы", f"[{lower_bound:.2f}, {upper_bound:.2f}]")
-
-        fig_anomalies = px.scatter(df, x=df.index, y=selected_col,
+            st.metric("Доля аномалий", f"{(anomalies_count / len(df) * 100):.2f}%")
+            if method == 'iqr':
+                lower_bound, upper_bound = scores.bounds.loc[selected_col]
+                st.metric("Границы", f"[{lower_bound:.2f}, {upper_bound:.2f}]")
+            else:
+                st.metric("Порог оценки", f"{scores.threshold:.2f}")
+
+        anomaly_label = 'Аномалия'
+        plot_source = pd.DataFrame({selected_col: df[selected_col].to_numpy(), anomaly_label: is_anomaly},
+                                   index=df.index)
+        plot_data, total_points = downsample_frame(plot_source, selected_col, strata_col=anomaly_label,
+                                                   keep_mask=is_anomaly, **plot_options())
+        fig_anomalies = px.scatter(plot_data, x=plot_data.index, y=selected_col,
                                    title=f'🔍 Обнаружение аномалий в {selected_col}',
-                                   color=((df[selected_col] < lower_bound) | (df[selected_col] > upper_bound)),
-                                   color_discrete_map={True: 'red', False: 'blue'})
+                                   color=anomaly_label,
+                                   color_discrete_map={True: 'red', False: 'blue'},
+                                   render_mode=scatter_render_mode())
         fig_anomalies.update_layout(height=500)
-        st.plotly_chart(fig_anomalies, use_container_width=True)
+        annotate_sampling(fig_anomalies, len(plot_data), total_points)
+        plotly_chart(fig_anomalies, use_container_width=True)
+
+        if method in UNIVARIATE_METHODS:
+            st.write(f"**Аномальные значения по переменным** (строк хотя бы с одной аномалией: {scores.count:,})")
+            counts = scores.column_counts()
+            st.dataframe(pd.DataFrame({'Аномалий': counts, 'Доля, %': (counts / len(df) * 100).round(2)}),
+                         use_container_width=True)
+        else:
+            st.write("**Наиболее аномальные строки** (оценка по всем числовым переменным)")
+            top = scores.top_rows()
+            st.dataframe(df.iloc[top].assign(**{'Оценка': scores.scores[top].round(3)}), use_container_width=True)
 
 
+@traced
 def create_summary_dashboard(df):
+    profile = get_profile(df)
     st.subheader("📋 Ключевые показатели")
 
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        st.metric("📊 Наблюдения", f"{len(df):,}")
+        st.metric("📊 Наблюдения", f"{profile.n_rows:,}")
 
     with col2:
-        st.metric("🔢 Переменные", f"{len(df.columns):,}")
+        st.metric("🔢 Переменные", f"{profile.n_cols:,}")
 
     with col3:
-        numeric_count = df.select_dtypes(include=[np.number]).shape[1]
+        numeric_count = len(profile.numeric_cols)
         st.metric("📈 Числовые", f"{numeric_count}")
 
     with col4:
-        categorical_count = df.select_dtypes(include=['object']).shape[1]
+        categorical_count = len(profile.categorical_cols)
         st.metric("🏷️ Категориальные", f"{categorical_count}")
 
     st.subheader("⚡ Быстрая статистика")
-    quick_stats = df.describe().T[['mean', 'std', 'min', 'max']].round(2)
+    quick_stats = profile.moments.T[['mean', 'std', 'min', 'max']].round(2)
     st.dataframe(quick_stats.style.background_gradient(cmap='YlOrBr'),
                  use_container_width=True)
 
 
+@traced
 def export_analysis(df):
+    profile = get_profile(df)
     st.markdown('<div class="section-header">📊 Визуализированные отчеты и экспорт</div>', unsafe_allow_html=True)
 
-    tab1, tab2, tab3, tab4 = st.tabs(
-        ["📈 Визуальный отчет", "📋 Статистический отчет", "🔍 Детальный анализ", "📤 Экспорт данных"])
+    numeric_cols = profile.numeric_cols
+    categorical_cols = profile.categorical_cols
+    tab1, tab2, tab3, tab4 = EXPORT_TABS
+    active_tab = section_tabs(EXPORT_TABS, key='export_tab')
 
-    with tab1:
+    if active_tab == tab1:
         st.subheader("📊 Визуальная сводка анализа")
 
         col1, col2, col3, col4 = st.columns(4)
 
         with col1:
-            total_rows = len(df)
+            total_rows = profile.n_rows
             st.metric("Всего наблюдений", f"{total_rows:,}")
 
         with col2:
-            total_cols = len(df.columns)
+            total_cols = profile.n_cols
             st.metric("Переменные", f"{total_cols:,}")
 
         with col3:
-            numeric_count = df.select_dtypes(include=[np.number]).shape[1]
+            numeric_count = len(profile.numeric_cols)
             st.metric("Числовые", f"{numeric_count}")
 
         with col4:
-            categorical_count = df.select_dtypes(include=['object']).shape[1]
+            categorical_count = len(profile.categorical_cols)
             st.metric("Категориальные", f"{categorical_count}")
 
         col1, col2 = st.columns(2)
 
         with col1:
 
-            type_counts = df.dtypes.value_counts()
+            type_counts = profile.dtype_counts
             fig_types = px.pie(
                 values=type_counts.values,
                 names=type_counts.index.astype(str),
@@ -786,11 +1043,11 @@ def export_analysis(df):
                 color_discrete_sequence=px.colors.qualitative.Set3
             )
             fig_types.update_layout(height=400)
-            st.plotly_chart(fig_types, use_container_width=True)
+            plotly_chart(fig_types, use_container_width=True)
 
         with col2:
 
-            missing_data = df.isnull().sum()
+            missing_data = profile.null_counts
             if missing_data.sum() > 0:
                 missing_data = missing_data[missing_data > 0].head(10)
                 fig_missing = px.bar(
@@ -802,12 +1059,11 @@ def export_analysis(df):
                     color_continuous_scale='Reds'
                 )
                 fig_missing.update_layout(height=400, showlegend=False)
-                st.plotly_chart(fig_missing, use_container_width=True)
+                plotly_chart(fig_missing, use_container_width=True)
             else:
                 st.success("✅ Пропущенные значения отсутствуют")
-                st.plotly_chart(px.bar(title="Нет пропущенных значений"), use_container_width=True)
+                plotly_chart(px.bar(title="Нет пропущенных значений"), use_container_width=True)
 
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
         if len(numeric_cols) > 0:
             st.subheader("📈 Анализ числовых переменных")
 
@@ -817,17 +1073,16 @@ def export_analysis(df):
                 col1, col2 = st.columns(2)
 
                 with col1:
-                    fig_dist = px.histogram(
-                        df, x=selected_num_col,
+                    fig_dist = histogram_figure(
+                        column_histogram(df, selected_num_col, 30), selected_num_col,
                         title=f'Распределение: {selected_num_col}',
-                        marginal='box',
-                        nbins=30
+                        box=column_box_stats(df, selected_num_col, column_quartiles(profile, selected_num_col))
                     )
                     fig_dist.update_layout(height=400)
-                    st.plotly_chart(fig_dist, use_container_width=True)
+                    plotly_chart(fig_dist, use_container_width=True)
 
                 with col2:
-                    stats_data = df[selected_num_col].describe()
+                    stats_data = profile.numeric_summary(**quantile_options())[selected_num_col]
                     stats_df = pd.DataFrame({
                         'Метрика': ['Количество', 'Среднее', 'Стд. отклонение', 'Минимум', '25%', 'Медиана', '75%',
                                     'Максимум'],
@@ -835,14 +1090,13 @@ def export_analysis(df):
                     })
                     st.dataframe(stats_df, use_container_width=True, height=400)
 
-        categorical_cols = df.select_dtypes(include=['object']).columns
         if len(categorical_cols) > 0:
             st.subheader("🏷️ Анализ категориальных переменных")
 
             selected_cat_col = st.selectbox("Выберите категориальную переменную:", categorical_cols)
 
             if selected_cat_col:
-                value_counts = df[selected_cat_col].value_counts().head(10)
+                value_counts = profile.top_values(selected_cat_col, 10, **count_options())['count']
 
                 col1, col2 = st.columns(2)
 
@@ -853,7 +1107,7 @@ def export_analysis(df):
                         title=f'Распределение: {selected_cat_col}'
                     )
                     fig_pie.update_layout(height=400)
-                    st.plotly_chart(fig_pie, use_container_width=True)
+                    plotly_chart(fig_pie, use_container_width=True)
 
                 with col2:
                     fig_bar = px.bar(
@@ -864,59 +1118,26 @@ def export_analysis(df):
                         color_continuous_scale='Viridis'
                     )
                     fig_bar.update_layout(height=400, xaxis_tickangle=-45)
-                    st.plotly_chart(fig_bar, use_container_width=True)
+                    plotly_chart(fig_bar, use_container_width=True)
 
-    with tab2:
+    elif active_tab == tab2:
         st.subheader("📋 Детальная статистика")
 
         st.write("**Общие характеристики данных:**")
         col1, col2 = st.columns(2)
 
         with col1:
-            info_data = {
-                'Метрика': ['Объем данных', 'Количество переменных', 'Числовые переменные',
-                            'Категориальные переменные', 'Пропущенные значения', 'Дубликаты'],
-                'Значение': [
-                    f"{len(df):,}",
-                    f"{len(df.columns):,}",
-                    f"{df.select_dtypes(include=[np.number]).shape[1]:,}",
-                    f"{df.select_dtypes(include=['object']).shape[1]:,}",
-                    f"{df.isnull().sum().sum():,}",
-                    f"{df.duplicated().sum():,}"
-                ]
-            }
-            st.dataframe(pd.DataFrame(info_data), use_container_width=True)
+            st.dataframe(summary_table(profile), use_container_width=True)
 
         with col2:
-            quality_metrics = {
-                'Метрика': ['Заполненность данных', 'Уникальность записей', 'Качество данных'],
-                'Значение': [
-                    f"{(1 - df.isnull().sum().sum() / (len(df) * len(df.columns))) * 100:.1f}%",
-                    f"{(1 - df.duplicated().sum() / len(df)) * 100:.1f}%",
-                    'Высокое' if df.isnull().sum().sum() == 0 and df.duplicated().sum() == 0 else 'Требует внимания'
-                ]
-            }
-            st.dataframe(pd.DataFrame(quality_metrics), use_container_width=True)
+            st.dataframe(quality_table(profile), use_container_width=True)
 
         if len(numeric_cols) > 0:
             st.subheader("📊 Статистика числовых переменных")
 
-            detailed_stats = df[numeric_cols].describe().T
-            detailed_stats['skewness'] = df[numeric_cols].skew()
-            detailed_stats['kurtosis'] = df[numeric_cols].kurtosis()
-
-            detailed_stats_ru = detailed_stats.rename(columns={
-                'count': 'Количество',
-                'mean': 'Среднее',
-                'std': 'Стд. отклонение',
-                'min': 'Минимум',
-                '25%': '25-й перцентиль',
-                '50%': 'Медиана',
-                '75%': '75-й перцентиль',
-                'max': 'Максимум',
-                'skewness': 'Асимметрия',
-                'kurtosis': 'Эксцесс'
-            })
+            detailed_stats = profile.numeric_stats(**quantile_options())
+
+            detailed_stats_ru = detailed_stats.rename(columns=STATS_LABELS)
 
             st.dataframe(
                 detailed_stats_ru.style.background_gradient(subset=['Среднее', 'Стд. отклонение'], cmap='Blues')
@@ -925,43 +1146,18 @@ def export_analysis(df):
                 height=400
             )
 
-    with tab3:
+    elif active_tab == tab3:
         st.subheader("🔍 Детальный анализ и инсайты")
 
         st.write("**🔍 Ключевые инсайты:**")
 
-        insights = []
-
-        missing_cols = df.columns[df.isnull().sum() > 0]
-        for col in missing_cols:
-            missing_pct = (df[col].isnull().sum() / len(df)) * 100
-            if missing_pct > 20:
-                insights.append(f"⚠️ Высокий уровень пропусков в '{col}': {missing_pct:.1f}%")
-
-        for col in numeric_cols:
-            skew_val = df[col].skew()
-            if abs(skew_val) > 1:
-                insights.append(f"📊 Сильная асимметрия в '{col}': {skew_val:.2f}")
-
-            Q1 = df[col].quantile(0.25)
-            Q3 = df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            outliers = df[(df[col] < Q1 - 1.5 * IQR) | (df[col] > Q3 + 1.5 * IQR)]
-            if len(outliers) > len(df) * 0.05:
-                insights.append(f"🎯 Много выбросов в '{col}': {len(outliers)} ({len(outliers) / len(df) * 100:.1f}%)")
-
-        for col in categorical_cols:
-            unique_count = df[col].nunique()
-            if unique_count == 1:
-                insights.append(f"📝 Постоянное значение в '{col}'")
-            elif unique_count > 50:
-                insights.append(f"🏷️ Много уникальных значений в '{col}': {unique_count}")
-
-        if insights:
-            for insight in insights:
-                if "⚠️" in insight:
+        found_insights = insights(profile, exact_counts=count_options()['exact'], **quantile_options())
+
+        if found_insights:
+            for level, insight in found_insights:
+                if level == 'error':
                     st.error(insight)
-                elif "🎯" in insight or "📊" in insight:
+                elif level == 'warning':
                     st.warning(insight)
                 else:
                     st.info(insight)
@@ -969,43 +1165,13 @@ def export_analysis(df):
             st.success("✅ Данные выглядят качественными без критических проблем")
 
         st.write("**💡 Рекомендации по анализу:**")
-        recommendations = []
-
-        if len(numeric_cols) >= 2:
-            recommendations.append("• Проанализировать корреляции между числовыми переменными")
-
-        if len(categorical_cols) > 0:
-            recommendations.append("• Исследовать взаимосвязи между категориальными и числовыми переменными")
-
-        if missing_cols.any():
-            recommendations.append("• Рассмотреть методы обработки пропущенных значений")
-
-        for rec in recommendations:
+        for rec in recommendations(profile):
             st.write(rec)
 
-    with tab4:
+    else:
         st.subheader("📤 Экспорт результатов")
 
-        report = f"""
-ОТЧЕТ ПЕРВИЧНОГО АНАЛИЗА ДАННЫХ
-{'=' * 50}
-
-ОБЩАЯ ИНФОРМАЦИЯ:
-• Объем данных: {df.shape[0]:,} наблюдений
-• Количество переменных: {df.shape[1]:,}
-• Числовые переменные: {df.select_dtypes(include=[np.number]).shape[1]:,}
-• Категориальные переменные: {df.select_dtypes(include=['object']).shape[1]:,}
-
-КАЧЕСТВО ДАННЫХ:
-• Всего пропущенных значений: {df.isnull().sum().sum():,}
-• Полных дубликатов записей: {df.duplicated().sum():,}
-• Переменные с пропусками: {', '.join(df.columns[df.isnull().sum() > 0].tolist()) if df.isnull().sum().sum() > 0 else 'отсутствуют'}
-
-СТАТИСТИЧЕСКИЕ ХАРАКТЕРИСТИКИ:
-{df.describe().to_string()}
-
-СГЕНЕРИРОВАНО: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}
-        """
+        report = text_report(profile, **quantile_options())
 
         st.text_area("Полный текстовый отчет", report, height=300)
 
@@ -1014,7 +1180,7 @@ def export_analysis(df):
 
         with col1:
             if st.button("Статистический отчет", use_container_width=True):
-                desc_stats = df.describe()
+                desc_stats = profile.describe_for(**quantile_options())
                 csv = desc_stats.to_csv()
                 st.download_button(
                     label="Скачать CSV",
@@ -1026,13 +1192,7 @@ def export_analysis(df):
 
         with col2:
             if st.button("Метаданные", use_container_width=True):
-                info_data = pd.DataFrame({
-                    'Переменная': df.columns,
-                    'Тип данных': df.dtypes,
-                    'Уникальные значения': df.nunique(),
-                    'Пропуски': df.isnull().sum(),
-                    'Доля пропусков %': (df.isnull().sum() / len(df) * 100).round(2)
-                })
+                info_data = metadata_table(profile, exact_counts=count_options()['exact'])
                 csv = info_data.to_csv(index=False)
                 st.download_button(
                     label="Скачать CSV",
@@ -1053,52 +1213,228 @@ def export_analysis(df):
                 )
 
         with col4:
+            export_format = st.selectbox("Формат данных", available_formats(),
+                                         format_func=lambda fmt: EXPORT_FORMATS[fmt][0], key='export_format',
+                                         label_visibility="collapsed")
             if st.button("Исходные данные", use_container_width=True):
-                csv = df.to_csv(index=False)
-                st.download_button(
-                    label="Скачать данные",
-                    data=csv,
-                    file_name="original_data.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
+                # Файл пишется частями во временный файл только после нажатия кнопки
+                with span('export ' + export_format, rows=len(df)), export_file(df, export_format) as exported:
+                    st.download_button(
+                        label="Скачать данные",
+                        data=exported,
+                        file_name=export_name("original_data", export_format),
+                        mime=EXPORT_FORMATS[export_format][2],
+                        use_container_width=True
+                    )
 
 
 st.markdown("---")
 uploaded_file = st.file_uploader(
     "Загрузите файл с данными для анализа",
-    type=['csv', 'xlsx', 'xls'],
-    help="Поддерживаются файлы формата CSV, Excel (XLSX) и старые файлы Excel (XLS)"
+    type=[extension.lstrip('.') for extension in SUPPORTED_EXTENSIONS],
+    help="Поддерживаются файлы формата CSV, Excel (XLSX), старые файлы Excel (XLS), "
+         "Parquet, Feather и Arrow IPC"
+)
+
+st.sidebar.markdown("### Параметры загрузки")
+streaming_mode = st.sidebar.checkbox(
+    "Потоковый режим для больших CSV",
+    value=False,
+    help="CSV читается частями, профиль строится без загрузки всей таблицы в память. "
+         "Доступны базовые характеристики, пропуски и диагностика качества."
 )
+chunk_rows = st.sidebar.number_input("Строк в одной части", min_value=10_000, max_value=5_000_000,
+                                     value=DEFAULT_CHUNK_ROWS, step=50_000, disabled=not streaming_mode)
+optimize_types = st.sidebar.checkbox(
+    "Оптимизировать типы данных при загрузке",
+    value=False,
+    key='optimize_dtypes',
+    help="Целые числа приводятся к наименьшему подходящему типу, строки с небольшим числом "
+         "уникальных значений - к category, остальные строки хранятся в формате Arrow"
+)
+data_files = list_data_files()
+local_file = None
+if data_files:
+    local_file = st.sidebar.selectbox(
+        "Файл из каталога данных",
+        options=[None] + data_files,
+        format_func=lambda name: "Не выбран" if name is None else name,
+        key='data_dir_file',
+        help=f"Parquet, Feather и Arrow IPC из каталога {DATA_DIR}; файлы читаются через отображение "
+             f"в память. Выбранный файл используется вместо загруженного"
+    )
+
+st.sidebar.markdown("### Параметры анализа")
+st.sidebar.checkbox(
+    "Точные квантили",
+    value=False,
+    key='exact_quantiles',
+    help="По умолчанию на больших таблицах процентили, границы IQR и число выбросов "
+         "оцениваются по скетчу KLL без сортировки столбцов"
+)
+st.sidebar.select_slider(
+    "Допустимая ошибка квантилей (доля ранга)",
+    options=[0.001, 0.0025, 0.005, 0.01, 0.02, 0.05],
+    value=DEFAULT_RANK_ERROR,
+    key='quantile_rank_error',
+    disabled=st.session_state.get('exact_quantiles', False)
+)
+st.sidebar.checkbox(
+    "Точные частоты и число уникальных значений",
+    value=False,
+    key='exact_counts',
+    help="По умолчанию на больших таблицах число уникальных значений оценивается HyperLogLog, "
+         "а самые частые категории - структурами Space-Saving и Count-Min с указанием погрешности"
+)
+
+st.sidebar.markdown("### Параметры графиков")
+st.sidebar.number_input(
+    "Максимум точек на диаграммах рассеяния",
+    min_value=1_000,
+    max_value=500_000,
+    value=DEFAULT_MAX_POINTS,
+    step=5_000,
+    key='plot_max_points',
+    help="Если точек больше, перед отрисовкой выполняется прореживание на сервере. "
+         "Аномальные значения сохраняются всегда"
+)
+st.sidebar.selectbox(
+    "Метод прореживания",
+    options=list(SAMPLING_METHODS),
+    format_func=SAMPLING_METHODS.get,
+    key='plot_sampling_method'
+)
+st.sidebar.checkbox("Отрисовка через WebGL", value=True, key='plot_webgl')
+
+st.sidebar.markdown("### Диагностика")
+profiling_mode = st.sidebar.checkbox(
+    "Режим профилирования",
+    value=False,
+    key='profiling_mode',
+    help="Замер времени, числа строк и памяти (tracemalloc) по разделам отчета и тяжелым вызовам. "
+         "Учет памяти заметно замедляет вычисления"
+)
+trace_panel = st.sidebar.container() if profiling_mode else None
+
+REPORT_SECTIONS = {
+    "📋 Базовые характеристики": basic_data_info,
+    "📊 Числовые переменные": enhanced_numeric_analysis,
+    "🏷️ Категориальные переменные": enhanced_categorical_analysis,
+    "🚀 Продвинутая аналитика": create_advanced_dashboard,
+    "⚠️ Пропущенные значения": missing_values_analysis,
+    "🔍 Качество данных": data_quality_checks,
+    "📤 Отчеты и экспорт": export_analysis
+}
+STREAMING_SECTIONS = ["📋 Базовые характеристики", "⚠️ Пропущенные значения", "🔍 Качество данных"]
+
+
+def column_projection(name, path=None, data=None):
+    """Выбор читаемых столбцов для колоночных форматов; None - читать все."""
+    if not is_columnar(name):
+        return None
+    all_columns = read_schema(name, path=path, data=data)
+    with st.expander(f"Столбцы для загрузки ({len(all_columns)})"):
+        selected = st.multiselect("Читать только выбранные столбцы:", all_columns, default=all_columns)
+    if not selected or len(selected) == len(all_columns):
+        return None
+    return selected
+
+
+def sheet_selection(name, data):
+    """Выбор листа книги Excel по списку листов, полученному без разбора книги.
+
+    Возвращает (лист, диапазон ячеек или None - весь лист).
+    """
+    if not is_excel(name):
+        return None, None
+    sheets = dict(list_sheets(name, data))
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        sheet = st.selectbox("Лист книги:", list(sheets),
+                             format_func=lambda sheet_name: f"{sheet_name} ({sheets[sheet_name]})"
+                             if sheets[sheet_name] else sheet_name)
+    with col2:
+        used_range = st.checkbox("Только используемый диапазон", value=False,
+                                 disabled=sheets[sheet] is None,
+                                 help="Читаются только ячейки из диапазона, записанного в книге; "
+                                      "первая строка диапазона считается заголовком")
+    return sheet, sheets[sheet] if used_range else None
+
+
+def session_holder():
+    """Идентификатор сессии в реестре таблиц; таблицы освобождаются, когда сессия завершается."""
+    if 'registry_holder' not in st.session_state:
+        st.session_state['registry_holder'] = RegistryHolder(get_registry())
+    return st.session_state['registry_holder'].id
 
-if uploaded_file is not None:
+
+def report_navigation(sections):
+    """Выбор раздела отчета; на каждом запуске скрипта строится только выбранный раздел."""
+    return st.radio("Раздел отчета:", sections, horizontal=True, key='report_section')
+
+
+def show_trace(trace, container):
+    with container:
+        st.write("**Замеры последнего запуска**")
+        st.dataframe(trace.frame().round(4), use_container_width=True, hide_index=True)
+        st.download_button("Скачать трассировку (JSON)", data=trace.to_json(),
+                           file_name="profiling_trace.json", mime="application/json",
+                           use_container_width=True)
+
+
+if uploaded_file is not None or local_file is not None:
+    trace = start_trace() if profiling_mode else None
     try:
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith('.xlsx'):
-            df = pd.read_excel(uploaded_file)
-        elif uploaded_file.name.endswith('.xls'):
-            df = pd.read_excel(uploaded_file, engine='xlrd')
-        else:
+        source_name = local_file if local_file is not None else uploaded_file.name
+        if not source_name.lower().endswith(SUPPORTED_EXTENSIONS):
             st.error("Неподдерживаемый формат файла")
             st.stop()
 
+        if local_file is None and streaming_mode and source_name.lower().endswith('.csv'):
+            get_registry().release_holder(session_holder())
+            stream_profile = profile_uploaded_csv(uploaded_file, chunk_rows=int(chunk_rows))
+
+            st.markdown('<div class="section-header">Предварительный просмотр данных</div>', unsafe_allow_html=True)
+            st.dataframe(stream_profile.preview, use_container_width=True)
+            st.caption(f"Обработано частей: {stream_profile.n_chunks:,}. Квантили и число уникальных "
+                       f"значений для высококардинальных переменных приближенные. Для поиска дубликатов "
+                       f"хранится 8-байтовый хэш каждой строки "
+                       f"({stream_profile.n_rows * 8 / 1024 ** 2:,.1f} МБ).")
+
+            section = report_navigation(STREAMING_SECTIONS)
+            REPORT_SECTIONS[section](stream_profile.preview, stream_profile)
+            st.stop()
+
+        if local_file is not None:
+            local_path = data_file_path(local_file)
+            columns = column_projection(local_file, path=local_path)
+            df, dataset_key = load_local_file(local_path, optimize=optimize_types, columns=columns,
+                                              holder=session_holder())
+        else:
+            columns = column_projection(uploaded_file.name, data=uploaded_file.getvalue())
+            sheet, used_range = sheet_selection(uploaded_file.name, uploaded_file.getvalue())
+            df, dataset_key = load_uploaded_file(uploaded_file, optimize=optimize_types, columns=columns,
+                                                 sheet=sheet, used_range=used_range, holder=session_holder())
+        # Сессия работает с одной таблицей: остальные, загруженные ею ранее, освобождаются
+        get_registry().release_holder(session_holder(), keep=dataset_key)
+
         st.markdown('<div class="section-header">Предварительный просмотр данных</div>', unsafe_allow_html=True)
         st.dataframe(df.head(10), use_container_width=True)
 
-        basic_data_info(df)
-        enhanced_numeric_analysis(df)
-        enhanced_categorical_analysis(df)
-        create_advanced_dashboard(df)
-        missing_values_analysis(df)
-        data_quality_checks(df)
-        export_analysis(df)
+        section = report_navigation(list(REPORT_SECTIONS))
+        REPORT_SECTIONS[section](df)
 
     except Exception as e:
         st.error(f"Ошибка при обработке файла: {str(e)}")
         st.info("Убедитесь, что файл имеет корректный формат и кодировку")
 
+    finally:
+        if trace is not None:
+            stop_trace(trace)
+            show_trace(trace, trace_panel)
+
 else:
+    get_registry().release_holder(session_holder())
     st.markdown('<div class="info-box">', unsafe_allow_html=True)
     st.write("### Начало работы")
     st.write("Для запуска анализа загрузите файл с данными в формате CSV или Excel.")
@@ -1174,8 +1510,8 @@ else:
         st.write("• Excel (XLSX)")
 
     with format_col3:
-        st.write("• Статистические данные")
-        st.write("• Другие табличные данные")
+        st.write("• Parquet")
+        st.write("• Feather и Arrow IPC")
 
     st.write("")
     st.write("**Для начала работы:**")
@@ -0,0 +1,284 @@
+"""Нагрузочные замеры шагов анализа на синтетических наборах данных.
+
+Каждый шаг вычислений и построения графика замеряется отдельно: лучшее и
+медианное время по нескольким повторам и пиковый объем выделенной памяти
+(tracemalloc, отдельный прогон). Результаты пишутся в JSON, который можно
+сравнить с предыдущим запуском:
+
+    python benchmark.py --rows 10000 250000 --cols 10 50 --output bench.json
+    python benchmark.py --compare bench_baseline.json --output bench.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from analysis_engine import AnalysisEngine
+from anomalies import ANOMALY_METHODS, anomaly_scores
+from correlation import correlation_matrix
+from data_profile import APPROX_COUNTS_MIN_ROWS, APPROX_QUANTILE_MIN_ROWS, DataProfile
+from downsampling import DEFAULT_MAX_POINTS, downsample_frame
+from figure_aggregates import (box_figure, box_stats, finite_values, histogram_counts, histogram_figure, kde_curve,
+                               violin_figure)
+from report import insights, text_report
+from trendlines import lowess_curve, ols_fit, paired_values
+
+DTYPES = ('float', 'int', 'str', 'datetime', 'bool')
+DEFAULT_REPEAT = 3
+REGRESSION_THRESHOLD = 1.25
+SELECTED_COLUMNS = 3
+# Сетка строк по умолчанию пересекает порог приближенных квантилей и счетчиков
+DEFAULT_ROWS = [10_000, 2 * max(APPROX_QUANTILE_MIN_ROWS, APPROX_COUNTS_MIN_ROWS) + 50_000]
+_PROFILE_CACHES = ('_sketches', '_approx_describe', '_column_sketches', '_value_counts')
+
+
+def synthetic_frame(rows, cols, null_rate=0.0, cardinality=20, dtypes=DTYPES, seed=0):
+    """Таблица rows x cols; типы столбцов чередуются по dtypes.
+
+    cardinality - число различных значений строковых столбцов, null_rate -
+    доля пропусков в каждом столбце (кроме bool).
+    """
+    rng = np.random.default_rng(seed)
+    categories = np.array([f"cat_{i}" for i in range(cardinality)], dtype=object)
+    data = {}
+    for i in range(cols):
+        kind = dtypes[i % len(dtypes)]
+        name = f"{kind}_{i}"
+        if kind == 'float':
+            values = rng.lognormal(0, 1, rows) if i % 2 else rng.standard_normal(rows) * (i + 1)
+        elif kind == 'int':
+            values = rng.integers(0, 1000, rows).astype(np.float64 if null_rate else np.int64)
+        elif kind == 'str':
+            values = categories[rng.zipf(1.5, rows) % cardinality]
+        elif kind == 'datetime':
+            values = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, rows), unit='s')
+            values = values.to_numpy()
+        else:
+            values = rng.random(rows) < 0.5
+        if null_rate and kind != 'bool':
+            values = pd.Series(values).mask(rng.random(rows) < null_rate).to_numpy()
+        data[name] = values
+    return pd.DataFrame(data)
+
+
+def _measure(step, repeat):
+    """(список времен, пик памяти в байтах, результат последнего вызова)."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = step()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        step()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return times, peak, result
+
+
+def _profile(df):
+    return DataProfile(df, engine=AnalysisEngine())
+
+
+def reset_profile(profile):
+    """Сбрасывает ленивые результаты профиля; остается посчитанное при создании (маска пропусков)."""
+    for cls in type(profile).__mro__:
+        for name, value in vars(cls).items():
+            if isinstance(value, cached_property):
+                profile.__dict__.pop(name, None)
+    for name in _PROFILE_CACHES:
+        getattr(profile, name).clear()
+    profile.task_timings.clear()
+
+
+def compute_steps(df):
+    """Шаги вычислений: имя -> функция без аргументов (без кэша, каждый вызов считает заново).
+
+    Профиль строится один раз (его создание - отдельный шаг profile.init),
+    а перед каждым вызовом шага по профилю его ленивые результаты сбрасываются.
+    """
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    selected = list(numeric_cols[:SELECTED_COLUMNS])
+    x, y = (selected + selected)[:2] if selected else (None, None)
+    profile = _profile(df)
+
+    def on_profile(compute):
+        def step():
+            reset_profile(profile)
+            return compute(profile)
+        return step
+
+    steps = {
+        'profile.init': lambda: _profile(df),
+        'profile.column_stats': on_profile(lambda p: p.column_stats),
+        'profile.nunique': on_profile(lambda p: p.nunique),
+        'profile.duplicate_count': on_profile(lambda p: p.duplicate_count),
+        'profile.numeric_summary_approx': on_profile(lambda p: p.numeric_summary(exact=False)),
+        'profile.distinct_counts_approx': on_profile(lambda p: p.distinct_counts(exact=False)),
+        'report.insights': on_profile(insights),
+        'report.text': on_profile(text_report),
+    }
+    if len(numeric_cols) >= 2:
+        steps['correlation.pearson'] = lambda: correlation_matrix(df, numeric_cols, 'pearson')
+        steps['correlation.spearman'] = lambda: correlation_matrix(df, numeric_cols, 'spearman')
+    if selected:
+        steps['aggregates.histogram'] = lambda: [histogram_counts(finite_values(df[col])) for col in selected]
+        steps['aggregates.box'] = lambda: [box_stats(values, *np.percentile(values, [25, 50, 75]))
+                                           for values in (finite_values(df[col]) for col in selected)]
+        steps['aggregates.kde'] = lambda: [kde_curve(finite_values(df[col])) for col in selected]
+        steps['downsample.reservoir'] = lambda: downsample_frame(df, y, x=x, method='reservoir')
+        steps['downsample.lttb'] = lambda: downsample_frame(df, y, method='lttb')
+        steps['trend.ols'] = lambda: ols_fit(*paired_values(df, x, y))
+        steps['trend.lowess'] = lambda: lowess_curve(*paired_values(df, x, y))
+        for method in ANOMALY_METHODS:
+            steps[f'anomalies.{method}'] = on_profile(
+                lambda p, method=method: anomaly_scores(df, numeric_cols, method, profile=p))
+    return steps
+
+
+def figure_steps(df):
+    """Шаги построения графиков по заранее посчитанным входным данным.
+
+    Каждый шаг строит фигуру и сериализует ее в JSON, как при отправке в браузер.
+    """
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    selected = list(numeric_cols[:SELECTED_COLUMNS])
+    if not selected:
+        return {}
+    x, y = (selected + selected)[:2]
+
+    values = {col: finite_values(df[col]) for col in selected}
+    hists = {col: histogram_counts(values[col]) for col in selected}
+    boxes = {col: box_stats(values[col], *np.percentile(values[col], [25, 50, 75])) for col in selected}
+    kdes = {col: kde_curve(values[col]) for col in selected}
+    scatter_data, _ = downsample_frame(df, y, x=x, max_points=DEFAULT_MAX_POINTS)
+    anomaly_data, _ = downsample_frame(df, y, max_points=DEFAULT_MAX_POINTS)
+    q1, q3 = boxes[y]['q1'], boxes[y]['q3']
+    is_anomaly = (anomaly_data[y] < q1 - 1.5 * (q3 - q1)) | (anomaly_data[y] > q3 + 1.5 * (q3 - q1))
+
+    steps = {
+        'figure.histogram': lambda: [histogram_figure(hists[col], col, col, box=boxes[col]) for col in selected],
+        'figure.box': lambda: box_figure(boxes, 'box'),
+        'figure.violin': lambda: violin_figure(kdes, boxes, 'violin'),
+        'figure.scatter': lambda: px.scatter(scatter_data, x=x, y=y, render_mode='webgl'),
+        'figure.anomalies': lambda: px.scatter(anomaly_data, x=anomaly_data.index, y=y, color=is_anomaly,
+                                               render_mode='webgl'),
+    }
+    if len(numeric_cols) >= 2:
+        corr = correlation_matrix(df, numeric_cols)
+        steps['figure.heatmap'] = lambda: px.imshow(corr.loc[selected, selected], text_auto=True)
+
+    def with_payload(build):
+        def step():
+            figures = build()
+            return [fig.to_json() for fig in (figures if isinstance(figures, list) else [figures])]
+        return step
+
+    return {name: with_payload(build) for name, build in steps.items()}
+
+
+def run_case(case, repeat=DEFAULT_REPEAT, step_filter=None):
+    df = synthetic_frame(**case)
+    results = []
+    for kind, steps in (('compute', compute_steps(df)), ('figure', figure_steps(df))):
+        for name, step in steps.items():
+            if step_filter and not re.search(step_filter, name):
+                continue
+            times, peak, result = _measure(step, repeat)
+            record = {
+                'case': case, 'step': name, 'kind': kind,
+                'seconds_min': min(times), 'seconds_median': statistics.median(times),
+                'peak_bytes': int(peak)
+            }
+            if kind == 'figure':
+                record['payload_bytes'] = sum(len(payload) for payload in result)
+            results.append(record)
+            print(f"{name:<34} {min(times) * 1000:10.2f} мс {peak / 1024 ** 2:10.2f} МБ", flush=True)
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'timestamp': pd.Timestamp.now().isoformat(timespec='seconds')
+    }
+
+
+def _result_key(record):
+    return json.dumps(record['case'], sort_keys=True), record['step']
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Шаги, ставшие медленнее baseline более чем в threshold раз: [(случай, шаг, было, стало)]."""
+    before = {_result_key(record): record['seconds_min'] for record in baseline['results']}
+    regressions = []
+    for record in current['results']:
+        old = before.get(_result_key(record))
+        if old and record['seconds_min'] > old * threshold:
+            regressions.append((record['case'], record['step'], old, record['seconds_min']))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры шагов анализа на синтетических данных")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--cols', type=int, nargs='+', default=[10])
+    parser.add_argument('--null-rates', type=float, nargs='+', default=[0.0, 0.1])
+    parser.add_argument('--cardinality', type=int, nargs='+', default=[20])
+    parser.add_argument('--dtypes', nargs='+', choices=DTYPES, default=list(DTYPES))
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--steps', default=None, help="Регулярное выражение для отбора шагов")
+    parser.add_argument('--output', '-o', default='bench_results.json')
+    parser.add_argument('--compare', default=None, help="JSON предыдущего запуска для поиска регрессий")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="Во сколько раз шаг должен замедлиться, чтобы считаться регрессией")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    for rows in args.rows:
+        for cols in args.cols:
+            for null_rate in args.null_rates:
+                for cardinality in args.cardinality:
+                    case = {'rows': rows, 'cols': cols, 'null_rate': null_rate, 'cardinality': cardinality,
+                            'dtypes': list(args.dtypes)}
+                    print(f"--- {case}", flush=True)
+                    results.extend(run_case(case, args.repeat, args.steps))
+
+    current = {'environment': environment(), 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as target:
+        json.dump(current, target, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as source:
+            regressions = compare(json.load(source), current, args.threshold)
+        for case, step, old, new in regressions:
+            print(f"Регрессия {step} {case}: {old * 1000:.2f} мс -> {new * 1000:.2f} мс", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Пакетный режим: отчеты по всем файлам каталога без Streamlit.
+
+Пример:
+    python cli.py data/incoming --output reports --workers 8 --formats json csv txt
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from analysis_engine import AnalysisEngine
+from data_profile import DEFAULT_RANK_ERROR, DataProfile
+from loader import SUPPORTED_EXTENSIONS, content_hash, parse_bytes
+from report import STATS_LABELS, report_dict, text_report
+
+REPORT_FORMATS = ('json', 'csv', 'txt')
+
+
+def find_files(input_dir, recursive=False):
+    paths = []
+    for root, _, names in os.walk(input_dir):
+        paths.extend(os.path.join(root, name) for name in names if name.lower().endswith(SUPPORTED_EXTENSIONS))
+        if not recursive:
+            break
+    return sorted(paths)
+
+
+def process_file(job):
+    """Строит отчеты по одному файлу; выполняется в отдельном процессе.
+
+    Ошибки разбора не прерывают пакет, а попадают в итоговую сводку.
+    """
+    path, report_name, output_dir, formats, options = job
+    start = time.perf_counter()
+    name = os.path.basename(path)
+    stem = os.path.join(output_dir, report_name)
+    try:
+        with open(path, 'rb') as source:
+            data = source.read()
+        df = parse_bytes(name, data)
+        df.attrs['dataset_key'] = content_hash(data)
+        # Параллелизм - на уровне файлов, внутри файла задачи выполняются последовательно
+        profile = DataProfile(df, engine=AnalysisEngine(max_workers=1, kind='thread'))
+
+        if 'json' in formats:
+            report = dict(file=report_name, **report_dict(profile, **options))
+            with open(f"{stem}.json", 'w', encoding='utf-8') as target:
+                json.dump(report, target, ensure_ascii=False, indent=2)
+        if 'csv' in formats and len(profile.numeric_cols):
+            stats = profile.numeric_stats(exact=options['exact'], rank_error=options['rank_error'])
+            stats.rename(columns=STATS_LABELS).to_csv(f"{stem}.stats.csv",
+                                                      encoding='utf-8-sig')
+        if 'txt' in formats:
+            with open(f"{stem}.txt", 'w', encoding='utf-8') as target:
+                target.write(text_report(profile, options['exact'], options['rank_error']))
+
+        return {'file': report_name, 'rows': profile.n_rows, 'columns': profile.n_cols,
+                'seconds': time.perf_counter() - start, 'error': None}
+    except Exception as error:
+        return {'file': report_name, 'rows': 0, 'columns': 0, 'seconds': time.perf_counter() - start,
+                'error': f"{type(error).__name__}: {error}"}
+
+
+def run_batch(input_dir, output_dir, workers=None, formats=REPORT_FORMATS, recursive=False,
+              exact=False, rank_error=DEFAULT_RANK_ERROR, exact_counts=False):
+    """Обрабатывает каталог и возвращает сводку с пропускной способностью."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = find_files(input_dir, recursive)
+    options = {'exact': exact, 'rank_error': rank_error, 'exact_counts': exact_counts}
+    engine = AnalysisEngine(max_workers=workers or os.cpu_count() or 1, kind='process')
+
+    start = time.perf_counter()
+    try:
+        # Имя отчета - относительный путь файла вместе с расширением, чтобы data.csv и data.xlsx не совпали
+        jobs = [(path, os.path.relpath(path, input_dir).replace(os.sep, '__'), output_dir, formats, options)
+                for path in paths]
+        results = engine.map('Файлы', process_file, jobs, labels=paths)
+    finally:
+        engine.shutdown()
+    elapsed = time.perf_counter() - start
+
+    rows = sum(result['rows'] for result in results)
+    summary = {
+        'files': len(results),
+        'failed': sum(result['error'] is not None for result in results),
+        'rows': rows,
+        'seconds': elapsed,
+        'files_per_sec': len(results) / elapsed if elapsed > 0 else 0.0,
+        'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0,
+        'workers': engine.max_workers,
+        'results': results
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as target:
+        json.dump(summary, target, ensure_ascii=False, indent=2)
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный первичный анализ файлов с данными")
+    parser.add_argument('input_dir', help="Каталог с файлами CSV, Excel, Parquet, Feather или Arrow IPC")
+    parser.add_argument('--output', '-o', default='reports', help="Каталог для отчетов (по умолчанию reports)")
+    parser.add_argument('--workers', '-w', type=int, default=None,
+                        help="Число процессов (по умолчанию - число ядер)")
+    parser.add_argument('--formats', nargs='+', choices=REPORT_FORMATS, default=list(REPORT_FORMATS),
+                        help="Форматы отчетов")
+    parser.add_argument('--recursive', '-r', action='store_true', help="Обходить вложенные каталоги")
+    parser.add_argument('--exact-quantiles', action='store_true',
+                        help="Точные квантили вместо скетча KLL на больших таблицах")
+    parser.add_argument('--rank-error', type=float, default=DEFAULT_RANK_ERROR,
+                        help="Допустимая ошибка приближенных квантилей (доля ранга)")
+    parser.add_argument('--exact-counts', action='store_true',
+                        help="Точные частоты и число уникальных значений")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.isdir(args.input_dir):
+        print(f"Каталог не найден: {args.input_dir}", file=sys.stderr)
+        return 2
+
+    summary = run_batch(args.input_dir, args.output, workers=args.workers, formats=args.formats,
+                        recursive=args.recursive, exact=args.exact_quantiles, rank_error=args.rank_error,
+                        exact_counts=args.exact_counts)
+
+    for result in summary['results']:
+        if result['error'] is not None:
+            print(f"Ошибка в {result['file']}: {result['error']}", file=sys.stderr)
+    print(f"Файлов: {summary['files']} (с ошибками: {summary['failed']}), строк: {summary['rows']:,}, "
+          f"время: {summary['seconds']:.2f} с")
+    print(f"Пропускная способность: {summary['files_per_sec']:.2f} файлов/с, {summary['rows_per_sec']:,.0f} строк/с")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Чтение колоночных форматов (Parquet, Feather, Arrow IPC) с выбором столбцов."""
+import os
+
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+ARROW_EXTENSIONS = ('.feather', '.arrow', '.ipc')
+COLUMNAR_EXTENSIONS = PARQUET_EXTENSIONS + ARROW_EXTENSIONS
+
+DATA_DIR = os.environ.get('ANALYSIS_DATA_DIR')
+
+
+def is_columnar(name):
+    return name.lower().endswith(COLUMNAR_EXTENSIONS)
+
+
+def _source(path=None, data=None):
+    """Путь к файлу или буфер над загруженными байтами без копирования."""
+    return path if path is not None else pa.BufferReader(data)
+
+
+def read_schema(name, path=None, data=None):
+    """Имена столбцов из метаданных файла, без чтения самих данных."""
+    source = _source(path, data)
+    if name.lower().endswith(PARQUET_EXTENSIONS):
+        return list(pq.read_schema(source, memory_map=path is not None).names)
+    if path is not None:
+        source = pa.memory_map(path)
+    try:
+        return list(pa.ipc.open_file(source).schema.names)
+    except pa.ArrowInvalid:
+        # Feather v1 не является файлом Arrow IPC
+        return list(feather.read_table(_source(path, data), memory_map=path is not None).column_names)
+
+
+def read_columnar(name, path=None, data=None, columns=None):
+    """Читает только столбцы columns (None - все) в DataFrame.
+
+    Локальные файлы отображаются в память: для Arrow IPC без сжатия столбцы
+    читаются без копирования, для Parquet с диска поднимаются только страницы
+    выбранных столбцов.
+    """
+    source = _source(path, data)
+    memory_map = path is not None
+    if name.lower().endswith(PARQUET_EXTENSIONS):
+        table = pq.read_table(source, columns=columns, memory_map=memory_map)
+    elif name.lower().endswith(ARROW_EXTENSIONS):
+        table = feather.read_table(source, columns=columns, memory_map=memory_map)
+    else:
+        raise ValueError(f"Неподдерживаемый формат файла: {name}")
+    return table.to_pandas(split_blocks=True)
+
+
+def list_data_files(data_dir=DATA_DIR):
+    """Колоночные файлы настроенного каталога данных (ANALYSIS_DATA_DIR)."""
+    if not data_dir or not os.path.isdir(data_dir):
+        return []
+    return sorted(entry.name for entry in os.scandir(data_dir) if entry.is_file() and is_columnar(entry.name))
+
+
+def data_file_path(file_name, data_dir=DATA_DIR):
+    """Путь к файлу каталога данных; имена с путями не принимаются."""
+    if os.path.basename(file_name) != file_name:
+        raise ValueError(f"Недопустимое имя файла: {file_name}")
+    return os.path.join(data_dir, file_name)
@@ -0,0 +1,97 @@
+"""Кэш корреляций для всех числовых столбцов набора данных."""
+import numpy as np
+import pandas as pd
+
+from memo import memoize
+
+CHUNK_BYTES = 64 * 1024 ** 2
+# Часть таблицы и ее временные копии в CorrelationStats.update: сама часть,
+# сдвинутая, маска, заполненная и квадраты - около пяти массивов float64
+CHUNK_COPIES = 5
+
+
+def chunk_rows(n_cols, chunk_bytes=CHUNK_BYTES):
+    """Число строк в части, чтобы update() укладывался примерно в chunk_bytes при любой ширине."""
+    return max(1, chunk_bytes // (8 * CHUNK_COPIES * max(n_cols, 1)))
+
+
+class CorrelationStats:
+    """Достаточные статистики для попарных корреляций (как в DataFrame.corr()).
+
+    Для каждой пары столбцов по строкам, где оба значения известны, хранятся
+    число наблюдений, суммы, суммы квадратов и сумма произведений. Все они
+    получаются матричными умножениями (BLAS) по частям таблицы, поэтому любое
+    подмножество столбцов потом вырезается из готовой матрицы.
+    """
+
+    def __init__(self, columns):
+        self.columns = pd.Index(columns)
+        p = len(self.columns)
+        self.counts = np.zeros((p, p))
+        self.sums = np.zeros((p, p))
+        self.squares = np.zeros((p, p))
+        self.cross = np.zeros((p, p))
+        self._centers = None
+
+    def update(self, chunk):
+        """Добавляет часть строк (массив n x p)."""
+        valid = np.isfinite(chunk)
+        if self._centers is None:
+            # Сдвиг на среднее первой части уменьшает потерю точности в суммах
+            with np.errstate(invalid='ignore'):
+                centers = np.nanmean(np.where(valid, chunk, np.nan), axis=0)
+            self._centers = np.nan_to_num(centers)
+        chunk = chunk - self._centers
+        mask = valid.astype(np.float64)
+        filled = np.where(valid, chunk, 0.0)
+        self.counts += mask.T @ mask
+        self.sums += filled.T @ mask
+        self.squares += (filled * filled).T @ mask
+        self.cross += filled.T @ filled
+        return self
+
+    def correlation(self):
+        n = self.counts
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covariance = n * self.cross - self.sums * self.sums.T
+            variance_i = n * self.squares - self.sums ** 2
+            variance_j = variance_i.T
+            corr = covariance / np.sqrt(variance_i * variance_j)
+        corr[n < 2] = np.nan
+        corr = np.clip(corr, -1, 1)
+        np.fill_diagonal(corr, np.where(np.diag(variance_i) > 0, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+def column_ranks(df, col):
+    """Средние ранги столбца; считаются один раз на набор данных."""
+    return memoize(df, ('rank', col), lambda: df[col].rank(method='average').to_numpy(dtype=np.float64))
+
+
+def correlation_matrix(df, numeric_cols, method='pearson'):
+    """Полная матрица корреляций по всем числовым столбцам, вычисляемая один раз.
+
+    Для Спирмена используются ранги, посчитанные по каждому столбцу целиком;
+    при наличии пропусков это отличается от попарного переранжирования в
+    DataFrame.corr(method='spearman').
+    """
+    def compute():
+        stats = CorrelationStats(numeric_cols)
+        ranks = [column_ranks(df, col) for col in numeric_cols] if method == 'spearman' else None
+        numeric_df = df[numeric_cols]
+        rows = chunk_rows(len(numeric_cols))
+        for start in range(0, len(df), rows):
+            stop = start + rows
+            if ranks is not None:
+                chunk = np.column_stack([r[start:stop] for r in ranks])
+            else:
+                chunk = numeric_df.iloc[start:stop].to_numpy(dtype=np.float64, na_value=np.nan)
+            stats.update(chunk)
+        return stats.correlation()
+
+    return memoize(df, ('correlation', method, tuple(numeric_cols)), compute)
+
+
+def correlation_subset(df, numeric_cols, selected_cols, method='pearson'):
+    matrix = correlation_matrix(df, numeric_cols, method)
+    return matrix.loc[selected_cols, selected_cols]
@@ -0,0 +1,293 @@
+"""Профиль набора данных: общие для всех разделов отчета характеристики столбцов."""
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from analysis_engine import (STAT_COLUMNS, block_null_bits, block_nunique, build_sketch, get_engine,
+                             numeric_column_stats, timing_frame)
+from duplicates import build_duplicate_index
+from memo import memoize
+from nullity import NullityMatrix
+from sketches import ColumnSketch, KLLSketch
+
+DEFAULT_RANK_ERROR = 0.01
+APPROX_QUANTILE_MIN_ROWS = 100_000
+APPROX_COUNTS_MIN_ROWS = 100_000
+SKETCH_BATCH_ROWS = 1 << 16
+
+
+def categorical_columns(df):
+    """Столбцы object, category и строковых типов (в том числе строки Arrow и str из pandas 3).
+
+    select_dtypes(include='object') строки Arrow в pandas 2 не выбирает, а в
+    pandas 3 предупреждает об изменении поведения, поэтому типы проверяются явно.
+    """
+    mask = [isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype) for dtype in df.dtypes]
+    return df.columns[np.array(mask, dtype=bool)]
+
+
+class ProfileBase:
+    """Общие производные характеристики для полного и потокового профилей.
+
+    Наследники задают n_rows, n_cols, columns, dtypes, numeric_cols,
+    categorical_cols, null_counts, missing_total, nunique, duplicate_index
+    и distinct_counts().
+    """
+
+    task_timings = ()
+    nullity = None
+
+    @property
+    def shape(self):
+        return self.n_rows, self.n_cols
+
+    @property
+    def null_pct(self):
+        return self.null_counts / self.n_rows * 100
+
+    @property
+    def missing_cols(self):
+        return self.columns[self.null_counts > 0]
+
+    def constant_columns(self, exact=True):
+        return self.columns[(self.distinct_counts(exact)['nunique'] == 1).to_numpy()]
+
+    @property
+    def completeness(self):
+        return 1 - self.missing_total / (self.n_rows * self.n_cols)
+
+    @property
+    def duplicate_count(self):
+        return self.duplicate_index.count
+
+    @cached_property
+    def dtype_counts(self):
+        return self.dtypes.value_counts()
+
+    def info_frame(self, exact=True):
+        distinct = self.distinct_counts(exact)
+        info_df = pd.DataFrame({
+            'Переменная': self.columns,
+            'Тип данных': self.dtypes,
+            'Уникальные значения': distinct['nunique'],
+            'Пропущенные значения': self.null_counts,
+            'Доля пропусков, %': self.null_pct.round(2)
+        })
+        if distinct['error'].any():
+            info_df.insert(3, 'Погрешность уникальных, ±', distinct['error'])
+        return info_df
+
+    def timing_summary(self):
+        return timing_frame(self.task_timings)
+
+
+class DataProfile(ProfileBase):
+    """Однократно вычисленные характеристики набора данных.
+
+    Пропуски и типы считаются сразу; более тяжелые величины (дубликаты,
+    describe, асимметрия) вычисляются при первом обращении и далее
+    переиспользуются всеми разделами. Независимые задачи по столбцам и частям
+    строк распределяются по пулу AnalysisEngine, время каждой сохраняется в
+    task_timings.
+    """
+
+    def __init__(self, df, engine=None):
+        self._df = df
+        self._engine = get_engine() if engine is None else engine
+        self.task_timings = []
+        self.n_rows = len(df)
+        self.n_cols = len(df.columns)
+        self.columns = df.columns
+        self.dtypes = df.dtypes
+        self.numeric_cols = df.select_dtypes(include=[np.number]).columns
+        self.categorical_cols = categorical_columns(df)
+        self.datetime_cols = df.select_dtypes(include=['datetime', 'datetimetz']).columns
+
+        packed = self._by_column_blocks('Пропуски', block_null_bits) if len(df.columns) else \
+            np.zeros((0, (self.n_rows + 7) // 8), dtype=np.uint8)
+        self.nullity = NullityMatrix(packed, self.n_rows, df.columns)
+        self.null_counts = self.nullity.counts()
+        self.missing_total = int(self.null_counts.sum())
+
+        self._sketches = {}
+        self._approx_describe = {}
+        self._column_sketches = {}
+        self._value_counts = {}
+
+    def _by_column_blocks(self, task, func, columns=None):
+        columns = self._df.columns if columns is None else columns
+        blocks = self._engine.column_blocks(columns)
+        results = self._engine.map(task, func, [self._df[columns[block]] for block in blocks],
+                                   labels=[f"{columns[block[0]]}..{columns[block[-1]]}" for block in blocks],
+                                   timings=self.task_timings)
+        return np.concatenate(results) if results else np.array([], dtype=np.int64)
+
+    @cached_property
+    def nunique(self):
+        return pd.Series(self._by_column_blocks('Уникальные значения', block_nunique), index=self.columns)
+
+    @cached_property
+    def memory_bytes(self):
+        return int(self._df.memory_usage(index=True, deep=True).sum())
+
+    @cached_property
+    def duplicate_index(self):
+        """Группы полных дубликатов; хэши строк считаются один раз для всех разделов."""
+        return build_duplicate_index(self._df, engine=self._engine, timings=self.task_timings)
+
+    def near_duplicates(self, columns, normalize_text=True, round_digits=None):
+        """Индекс дубликатов по подмножеству столбцов с нормализацией значений (кэшируется)."""
+        columns = tuple(columns)
+        return memoize(self._df, ('near_duplicates', columns, normalize_text, round_digits),
+                       lambda: build_duplicate_index(self._df, columns, normalize_text, round_digits,
+                                                     engine=self._engine))
+
+    def duplicate_rows(self, index, group):
+        """Строки группы group индекса index."""
+        return self._df.iloc[index.group_positions(group)]
+
+    @cached_property
+    def column_stats(self):
+        """Статистики числовых столбцов (STAT_COLUMNS), по одной задаче на столбец."""
+        cols = self.numeric_cols
+        rows = self._engine.map('Статистики столбцов', numeric_column_stats, [self._df[col] for col in cols],
+                                labels=cols, timings=self.task_timings)
+        return pd.DataFrame(rows, index=cols, columns=STAT_COLUMNS, dtype=np.float64)
+
+    @cached_property
+    def describe(self):
+        """Результат df.describe() для всей таблицы."""
+        return self._df.describe()
+
+    @cached_property
+    def numeric_describe(self):
+        if len(self.numeric_cols) == 0:
+            return self._df[self.numeric_cols].describe()
+        return self.column_stats[STAT_COLUMNS[:8]].T
+
+    @property
+    def skew(self):
+        return self.column_stats['skewness']
+
+    @property
+    def kurtosis(self):
+        return self.column_stats['kurtosis']
+
+    @property
+    def inf_counts(self):
+        return self.column_stats['inf'].astype(np.int64)
+
+    @cached_property
+    def moments(self):
+        """count/mean/std/min/max числовых столбцов - без сортировки значений."""
+        return self._df[self.numeric_cols].agg(['count', 'mean', 'std', 'min', 'max'])
+
+    def use_sketch(self, exact):
+        """Приближенные квантили имеют смысл только на больших таблицах."""
+        return not exact and self.n_rows > APPROX_QUANTILE_MIN_ROWS
+
+    def _build_quantile_sketches(self, cols, rank_error):
+        cols = [col for col in cols if (col, rank_error) not in self._sketches]
+        items = [(KLLSketch.for_error(rank_error, seed=0),
+                  self._df[col].to_numpy(dtype=np.float64, na_value=np.nan), SKETCH_BATCH_ROWS) for col in cols]
+        for col, sketch in zip(cols, self._engine.map('Скетчи квантилей', build_sketch, items, labels=cols,
+                                                      timings=self.task_timings)):
+            self._sketches[(col, rank_error)] = sketch
+
+    def quantile_sketch(self, col, rank_error=DEFAULT_RANK_ERROR):
+        if (col, rank_error) not in self._sketches:
+            self._build_quantile_sketches([col], rank_error)
+        return self._sketches[(col, rank_error)]
+
+    def numeric_summary(self, exact=True, rank_error=DEFAULT_RANK_ERROR):
+        """Аналог describe() по числовым столбцам; при exact=False процентили берутся из скетчей."""
+        if not self.use_sketch(exact):
+            return self.numeric_describe
+        summary = self._approx_describe.get(rank_error)
+        if summary is None:
+            self._build_quantile_sketches(self.numeric_cols, rank_error)
+            quartiles = pd.DataFrame(
+                {col: self.quantile_sketch(col, rank_error).quantile([0.25, 0.5, 0.75]) for col in self.numeric_cols},
+                index=['25%', '50%', '75%'])
+            summary = pd.concat([self.moments.loc[['count', 'mean', 'std', 'min']].astype(np.float64),
+                                 quartiles,
+                                 self.moments.loc[['max']].astype(np.float64)])
+            self._approx_describe[rank_error] = summary
+        return summary
+
+    def describe_for(self, exact=True, rank_error=DEFAULT_RANK_ERROR):
+        if len(self.numeric_cols) == 0:
+            return self.describe
+        return self.numeric_summary(exact, rank_error)
+
+    def iqr_bounds(self, col, exact=True, rank_error=DEFAULT_RANK_ERROR):
+        """Квартили и границы выбросов по правилу 1.5 * IQR: (Q1, Q3, нижняя, верхняя)."""
+        if self.use_sketch(exact):
+            q1, q3 = self.quantile_sketch(col, rank_error).quantile([0.25, 0.75])
+        else:
+            q1, q3 = self.numeric_describe.loc[['25%', '75%'], col]
+        iqr = q3 - q1
+        return q1, q3, q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+    def outlier_count(self, col, exact=True, rank_error=DEFAULT_RANK_ERROR):
+        _, _, lower_bound, upper_bound = self.iqr_bounds(col, exact, rank_error)
+        if self.use_sketch(exact):
+            sketch = self.quantile_sketch(col, rank_error)
+            share = sketch.rank(lower_bound, inclusive=False) + 1 - sketch.rank(upper_bound)
+            return int(round(share * sketch.n))
+        return int(self.column_stats.loc[col, 'outliers'])
+
+    def outlier_counts(self, exact=True, rank_error=DEFAULT_RANK_ERROR):
+        """Число выбросов по всем числовым столбцам."""
+        if not self.use_sketch(exact):
+            return self.column_stats['outliers'].astype(np.int64)
+        self._build_quantile_sketches(self.numeric_cols, rank_error)
+        return pd.Series([self.outlier_count(col, exact, rank_error) for col in self.numeric_cols],
+                         index=self.numeric_cols, dtype=np.int64)
+
+    def use_count_sketch(self, exact):
+        return not exact and self.n_rows > APPROX_COUNTS_MIN_ROWS
+
+    def _build_column_sketches(self, cols):
+        cols = [col for col in cols if col not in self._column_sketches]
+        items = [(ColumnSketch(), self._df[col].reset_index(drop=True), SKETCH_BATCH_ROWS * 4) for col in cols]
+        for col, sketch in zip(cols, self._engine.map('Скетчи частот', build_sketch, items, labels=cols,
+                                                      timings=self.task_timings)):
+            self._column_sketches[col] = sketch
+
+    def column_sketch(self, col):
+        if col not in self._column_sketches:
+            self._build_column_sketches([col])
+        return self._column_sketches[col]
+
+    def distinct_counts(self, exact=True):
+        """Число уникальных значений по столбцам: колонки nunique и error (±)."""
+        if not self.use_count_sketch(exact):
+            return pd.DataFrame({'nunique': self.nunique, 'error': 0})
+        self._build_column_sketches(self.columns)
+        counts = [self.column_sketch(col).distinct_count() for col in self.columns]
+        return pd.DataFrame(counts, index=self.columns, columns=['nunique', 'error'], dtype=np.int64)
+
+    def top_values(self, col, n=15, exact=True):
+        """n самых частых значений столбца: count и граница ошибки error."""
+        if self.use_count_sketch(exact):
+            return self.column_sketch(col).heavy_hitters(n)
+        counts = self._value_counts.get(col)
+        if counts is None:
+            counts = self._df[col].value_counts()
+            self._value_counts[col] = counts
+        counts = counts.head(n)
+        return pd.DataFrame({'count': counts, 'error': 0}, index=counts.index)
+
+    def numeric_stats(self, cols=None, exact=True, rank_error=DEFAULT_RANK_ERROR):
+        """describe().T с асимметрией и эксцессом для выбранных числовых столбцов."""
+        cols = list(self.numeric_cols) if cols is None else list(cols)
+        stats_df = self.numeric_summary(exact, rank_error)[cols].T
+        stats_df['skewness'] = self.skew[cols]
+        stats_df['kurtosis'] = self.kurtosis[cols]
+        return stats_df
+
+
+def get_profile(df):
+    return memoize(df, 'profile', lambda: DataProfile(df))
@@ -0,0 +1,132 @@
+"""Распознавание столбцов с датами и подготовка временных рядов.
+
+Формат даты угадывается по выборке значений, после чего весь столбец
+разбирается одним векторным вызовом pd.to_datetime с явным форматом - без
+разбора каждого значения по отдельности. Среди подходящих форматов первым
+проверяется порядок «день, месяц»: если выборка не исключает его (все дни
+не больше 12), 03.04.2024 читается как 3 апреля, как принято в интерфейсе.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from memo import memoize
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    from pandas.core.tools.datetimes import guess_datetime_format
+
+DATETIME_SAMPLE_ROWS = 1000
+GUESS_VALUES = 20
+
+RESAMPLE_RULES = {
+    'raw': 'Без агрегации',
+    'h': 'Час',
+    'D': 'День',
+    'W': 'Неделя'
+}
+RESAMPLE_AGGREGATIONS = {
+    'mean': 'Среднее',
+    'sum': 'Сумма',
+    'min': 'Минимум',
+    'max': 'Максимум',
+    'count': 'Количество'
+}
+
+
+def _year_day_month(fmt):
+    """Порядок «год, день, месяц» (так dayfirst читает ISO 2024-03-04) на практике не встречается."""
+    positions = [fmt.find(token) for token in ('%Y', '%d', '%m')]
+    return -1 not in positions and positions[0] < positions[1] < positions[2]
+
+
+def _candidate_formats(sample):
+    """Форматы, угаданные по первым значениям выборки; день-первым - раньше месяц-первым."""
+    formats = []
+    for value in sample[:GUESS_VALUES]:
+        for dayfirst in (True, False):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)
+                fmt = guess_datetime_format(value, dayfirst=dayfirst)
+            # Только год (например, '2024') датой не считаем
+            if fmt and ('%m' in fmt or '%b' in fmt or '%B' in fmt) and fmt not in formats \
+                    and not _year_day_month(fmt):
+                formats.append(fmt)
+    return formats
+
+
+def infer_datetime_format(series, sample_rows=DATETIME_SAMPLE_ROWS):
+    """Формат, которым разбираются все непустые значения выборки, или None."""
+    if not (pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)):
+        return None
+    values = series.dropna()
+    # Выборка равномерно по всему столбцу: в первых строках день месяца может не превышать 12
+    positions = np.linspace(0, len(values) - 1, min(sample_rows, len(values))).astype(np.int64)
+    sample = values.iloc[np.unique(positions)]
+    if not len(sample) or not sample.map(type).eq(str).all():
+        return None
+    sample = sample.str.strip()
+
+    for fmt in _candidate_formats(sample.tolist()):
+        if pd.to_datetime(sample, format=fmt, errors='coerce').notna().all():
+            return fmt
+    return None
+
+
+def parse_datetime_columns(df, sample_rows=DATETIME_SAMPLE_ROWS):
+    """Переводит строковые столбцы с датами в datetime64.
+
+    Столбец переводится, только если разбираются все его непустые значения,
+    поэтому пропусков после перевода не становится больше. Распознанные
+    форматы сохраняются в df.attrs['datetime_formats'].
+    """
+    formats = {}
+    for col in df.columns:
+        fmt = infer_datetime_format(df[col], sample_rows)
+        if fmt is None:
+            continue
+        try:
+            parsed = pd.to_datetime(df[col].str.strip(), format=fmt, errors='coerce')
+        except (ValueError, TypeError):
+            continue
+        if parsed.notna().sum() < df[col].notna().sum():
+            continue
+        formats[col] = fmt
+        df[col] = parsed
+    if formats:
+        df.attrs['datetime_formats'] = formats
+    return df
+
+
+def time_series(df, time_col, value_col, rule='raw', aggregation='mean', window=None):
+    """Ряд value_col по времени time_col: агрегированный по правилу rule и сглаженный скользящим окном.
+
+    window - число точек ряда (после агрегации) для скользящего среднего.
+    Возвращает DataFrame со столбцами time_col, value_col и, при заданном
+    window, столбцом скользящего среднего.
+    """
+    series = pd.Series(df[value_col].to_numpy(dtype=np.float64, na_value=np.nan),
+                       index=pd.DatetimeIndex(df[time_col]), name=value_col)
+    series = series[series.index.notna()]
+    if rule == 'raw':
+        series = series.sort_index(kind='stable').dropna()
+    else:
+        series = series.resample(rule).agg(aggregation)
+        if aggregation != 'count':
+            series = series.dropna()
+
+    result = series.rename_axis(time_col).reset_index()
+    if window:
+        result[rolling_label(window)] = series.rolling(window, min_periods=1).mean().to_numpy()
+    return result
+
+
+def cached_time_series(df, time_col, value_col, rule='raw', aggregation='mean', window=None):
+    return memoize(df, ('time_series', time_col, value_col, rule, aggregation, window),
+                   lambda: time_series(df, time_col, value_col, rule, aggregation, window))
+
+
+def rolling_label(window):
+    return f"Скользящее среднее ({window})"
@@ -0,0 +1,165 @@
+"""Прореживание точек перед построением графиков на стороне сервера."""
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_POINTS = 20_000
+STRATIFY_BINS = 10
+MIN_PER_STRATUM = 20
+
+SAMPLING_METHODS = {
+    'auto': 'Автоматически',
+    'reservoir': 'Случайная выборка (reservoir)',
+    'stratified': 'Стратифицированная',
+    'lttb': 'LTTB (для упорядоченных рядов)',
+    'minmax': 'Min/max по интервалам (для рядов)'
+}
+
+
+def reservoir_indices(n, k, rng):
+    """Равномерная выборка k позиций из n без возвращения.
+
+    Распределение совпадает с reservoir sampling; так как таблица уже в
+    памяти, позиции выбираются сразу, без прохода по потоку.
+    """
+    return np.sort(rng.choice(n, size=k, replace=False))
+
+
+def strata_codes(values):
+    """Коды групп; числовые значения разбиваются на STRATIFY_BINS равнонаполненных интервалов."""
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values) and values.nunique() > STRATIFY_BINS:
+        return pd.qcut(values.rank(method='first'), STRATIFY_BINS, labels=False).to_numpy(dtype=np.int64)
+    return pd.factorize(values, use_na_sentinel=False)[0]
+
+
+def stratified_indices(strata, k, rng, min_per_stratum=MIN_PER_STRATUM):
+    """Выборка пропорционально размерам групп, но не менее min_per_stratum из каждой."""
+    codes = strata_codes(strata)
+    n = len(codes)
+    counts = np.bincount(codes)
+    min_per_stratum = min(min_per_stratum, max(1, k // len(counts)))
+    quota = np.minimum(counts, np.maximum(np.round(counts * k / n).astype(np.int64), min_per_stratum))
+
+    order = np.lexsort((rng.random(n), codes))
+    starts = np.cumsum(counts) - counts
+    rank_in_stratum = np.empty(n, dtype=np.int64)
+    rank_in_stratum[order] = np.arange(n) - np.repeat(starts, counts)
+    return np.flatnonzero(rank_in_stratum < quota[codes])
+
+
+def lttb_indices(x, y, k):
+    """Largest-Triangle-Three-Buckets: k точек, сохраняющих форму ряда, упорядоченного по x."""
+    n = len(x)
+    if k >= n or k < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, k - 1).astype(np.int64)
+    selected = np.empty(k, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(k - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area)) if end > start else start
+        selected[i + 1] = a
+    return np.unique(selected)
+
+
+def minmax_indices(y, k):
+    """Минимум и максимум в каждом из k / 2 равных по числу точек интервалов упорядоченного ряда.
+
+    Пики и провалы сохраняются при любом прореживании, поэтому форма
+    длинного ряда (например, посекундных данных за годы) не сглаживается.
+    """
+    n = len(y)
+    buckets = max(k // 2, 1)
+    if k >= n:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    size = -(-n // buckets)
+    buckets = -(-n // size)
+    padding = buckets * size - n
+    starts = np.arange(buckets) * size
+    lows = np.concatenate([y, np.full(padding, np.inf)]).reshape(buckets, size).argmin(axis=1)
+    highs = np.concatenate([y, np.full(padding, -np.inf)]).reshape(buckets, size).argmax(axis=1)
+    return np.union1d(starts + lows, starts + highs)
+
+
+def sample_positions(n, max_points, method='reservoir', x=None, y=None, strata=None, keep=None, seed=0):
+    """Позиции строк для отображения; строки с keep=True сохраняются всегда."""
+    if n <= max_points:
+        return np.arange(n)
+
+    rng = np.random.default_rng(seed)
+    if method == 'lttb':
+        positions = lttb_indices(np.arange(n) if x is None else x, y, max_points)
+    elif method == 'minmax':
+        positions = minmax_indices(y, max_points)
+    elif method == 'stratified':
+        positions = stratified_indices(y if strata is None else strata, max_points, rng)
+    else:
+        positions = reservoir_indices(n, max_points, rng)
+
+    if keep is not None:
+        positions = np.union1d(positions, np.flatnonzero(keep))
+    return positions
+
+
+def axis_values(series):
+    """Значения оси как float64; даты - в наносекундах."""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series.astype('int64').to_numpy(dtype=np.float64)
+    return series.to_numpy(dtype=np.float64)
+
+
+def downsample_frame(df, y, x=None, max_points=DEFAULT_MAX_POINTS, method='auto', strata_col=None,
+                     keep_mask=None, ordered=False, seed=0):
+    """Возвращает (прореженная таблица, всего точек) для диаграммы рассеяния.
+
+    x=None означает построение по индексу. Для method='auto' упорядоченные
+    ряды прореживаются LTTB, при заданной группировке - стратифицированно,
+    иначе - случайной выборкой.
+    """
+    cols = [c for c in dict.fromkeys([x, y, strata_col]) if c is not None]
+    valid = df[cols].notna().all(axis=1).to_numpy()
+    if keep_mask is not None:
+        keep_mask = np.asarray(keep_mask)[valid]
+    data = df.loc[valid, cols]
+    total = len(data)
+
+    if method == 'auto':
+        if ordered or x is None:
+            method = 'lttb'
+        elif strata_col is not None:
+            method = 'stratified'
+        else:
+            method = 'reservoir'
+
+    if method in ('lttb', 'minmax') and x is not None and not ordered:
+        order = np.argsort(data[x].to_numpy(), kind='stable')
+        data = data.iloc[order]
+        if keep_mask is not None:
+            keep_mask = keep_mask[order]
+
+    positions = sample_positions(
+        total, max_points, method=method,
+        x=None if x is None else axis_values(data[x]),
+        y=data[y].to_numpy(dtype=np.float64),
+        strata=None if strata_col is None else data[strata_col].to_numpy(),
+        keep=keep_mask, seed=seed)
+    return data.iloc[positions], total
+
+
+def annotate_sampling(fig, shown, total):
+    """Подпись на графике с количеством показанных точек."""
+    text = f"Показано {shown:,} из {total:,} точек" if shown < total else f"Показаны все {total:,} точек"
+    fig.add_annotation(text=text, xref='paper', yref='paper', x=1, y=1.08,
+                       showarrow=False, xanchor='right', font=dict(size=11, color='gray'))
+    return fig
@@ -0,0 +1,66 @@
+"""Уменьшение объема таблицы в памяти за счет более компактных типов данных."""
+import numpy as np
+import pandas as pd
+
+CATEGORY_MAX_RATIO = 0.5
+CATEGORY_MAX_UNIQUE = 50_000
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    ARROW_STRING_DTYPE = None
+else:
+    try:
+        # Пропуски остаются NaN, как у обычных строковых столбцов
+        ARROW_STRING_DTYPE = pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:
+        ARROW_STRING_DTYPE = pd.StringDtype('pyarrow')
+
+
+def _downcast_integer(series):
+    return pd.to_numeric(series, downcast='integer') if series.dtype.kind in 'iu' else series
+
+
+def _compact_strings(series, use_arrow_strings):
+    n_unique = series.nunique()
+    if n_unique <= CATEGORY_MAX_UNIQUE and n_unique <= len(series) * CATEGORY_MAX_RATIO:
+        return series.astype('category')
+    if use_arrow_strings and ARROW_STRING_DTYPE is not None and series.dtype != ARROW_STRING_DTYPE \
+            and pd.api.types.infer_dtype(series, skipna=True) == 'string':
+        return series.astype(ARROW_STRING_DTYPE)
+    return series
+
+
+def optimize_dtypes(df, use_arrow_strings=True):
+    """Возвращает (оптимизированная таблица, отчет по столбцам).
+
+    Целые числа приводятся к наименьшему подходящему типу. float64 не
+    трогается: pandas суммирует float32 с меньшей точностью, и средние
+    изменились бы. Строковые столбцы с небольшим числом уникальных значений
+    становятся category, остальные - строками в формате Arrow. Значения при
+    этом не меняются, поэтому результаты анализа совпадают.
+    """
+    optimized = {}
+    report = []
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+            result = series
+        elif pd.api.types.is_integer_dtype(series):
+            result = _downcast_integer(series)
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            result = _compact_strings(series, use_arrow_strings)
+        else:
+            result = series
+        optimized[col] = result
+        report.append({
+            'Переменная': col,
+            'Исходный тип': str(series.dtype),
+            'Новый тип': str(result.dtype),
+            'Память до, байт': int(series.memory_usage(index=False, deep=True)),
+            'Память после, байт': int(result.memory_usage(index=False, deep=True))
+        })
+
+    optimized_df = pd.DataFrame(optimized, index=df.index)
+    optimized_df.attrs = dict(df.attrs)
+    return optimized_df, pd.DataFrame(report)
@@ -0,0 +1,149 @@
+"""Индекс дубликатов строк по 64-битным хэшам.
+
+Хэши строк считаются один раз векторно по столбцам (pd.util.hash_pandas_object)
+частями по chunk_rows строк; группы одинаковых хэшей дают число дубликатов и
+группы повторяющихся записей. Совпадение хэшей проверяется точным сравнением
+только на строках-кандидатах, поэтому результат точный.
+"""
+import numpy as np
+import pandas as pd
+
+from analysis_engine import ROW_CHUNK, get_engine, row_chunks, row_hashes
+from instrumentation import span
+
+GROUP_PREVIEW = 20
+
+
+def hash_rows(df, engine=None, chunk_rows=ROW_CHUNK, timings=None):
+    """Хэши строк df (uint64), части по chunk_rows строк считаются параллельно."""
+    engine = get_engine() if engine is None else engine
+    chunks = row_chunks(df, chunk_rows)
+    hashes = engine.map('Хэши строк', row_hashes, chunks, labels=[chunk.index[0] for chunk in chunks],
+                        timings=timings)
+    return np.concatenate(hashes) if hashes else np.array([], dtype=np.uint64)
+
+
+def normalize_rows(df, normalize_text=True, round_digits=None):
+    """Копия df для поиска почти-дубликатов: текст без регистра и крайних пробелов, округленные числа."""
+    normalized = {}
+    for col in df.columns:
+        series = df[col]
+        if normalize_text and (pd.api.types.is_object_dtype(series.dtype)
+                               or pd.api.types.is_string_dtype(series.dtype)):
+            series = series.where(series.isna(), series.astype(str).str.strip().str.casefold())
+        elif round_digits is not None and pd.api.types.is_float_dtype(series.dtype):
+            series = series.round(round_digits)
+        normalized[col] = series
+    return pd.DataFrame(normalized, index=df.index)
+
+
+class DuplicateIndex:
+    """Группы одинаковых строк: номер группы для каждой строки (-1 - уникальная) и размеры групп.
+
+    Группы нумеруются по убыванию размера. Если frame не задан, группы
+    определяются только по хэшам (потоковый режим, где строки не хранятся).
+    """
+
+    def __init__(self, hashes, frame=None):
+        self.n_rows = len(hashes)
+        codes, sizes = self._hash_groups(hashes)
+        if frame is not None and len(sizes):
+            codes, sizes = self._verify(frame, codes, sizes)
+        self.verified = frame is not None
+
+        order = np.argsort(-sizes, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        self.group_ids = np.where(codes >= 0, rank[np.maximum(codes, 0)], -1) if len(rank) else codes
+        self.group_sizes = sizes[order]
+
+    @staticmethod
+    def _hash_groups(hashes):
+        """Коды групп повторяющихся хэшей (-1 - хэш встречается один раз) и их размеры."""
+        codes = np.full(len(hashes), -1, dtype=np.int64)
+        if not len(hashes):
+            return codes, np.array([], dtype=np.int64)
+        _, inverse, counts = np.unique(hashes, return_inverse=True, return_counts=True)
+        repeated = counts > 1
+        group_of_unique = np.cumsum(repeated) - 1
+        candidates = repeated[inverse]
+        codes[candidates] = group_of_unique[inverse[candidates]]
+        return codes, counts[repeated].astype(np.int64)
+
+    @staticmethod
+    def _verify(frame, codes, sizes):
+        """Точная проверка кандидатов; при коллизии хэшей группы пересобираются по значениям."""
+        positions = np.flatnonzero(codes >= 0)
+        candidates = frame.iloc[positions]
+        with span('df.duplicated', rows=len(positions)):
+            exact = int(candidates.duplicated().sum())
+        if exact == int((sizes - 1).sum()):
+            return codes, sizes
+
+        exact_codes = candidates.groupby(list(candidates.columns), dropna=False, sort=False).ngroup().to_numpy()
+        counts = np.bincount(exact_codes)
+        repeated = counts > 1
+        group_of_unique = np.cumsum(repeated) - 1
+        codes = np.full(len(codes), -1, dtype=np.int64)
+        keep = repeated[exact_codes]
+        codes[positions[keep]] = group_of_unique[exact_codes[keep]]
+        return codes, counts[repeated].astype(np.int64)
+
+    @property
+    def count(self):
+        """Число строк, повторяющих более раннюю строку (как df.duplicated().sum())."""
+        return int((self.group_sizes - 1).sum())
+
+    @property
+    def n_groups(self):
+        return len(self.group_sizes)
+
+    @property
+    def duplicated_rows(self):
+        """Число строк, входящих в группы дубликатов (как df.duplicated(keep=False).sum())."""
+        return int(self.group_sizes.sum())
+
+    def duplicated_mask(self, keep='first'):
+        """Маска как у df.duplicated(keep=...): 'first', 'last' или False."""
+        in_group = self.group_ids >= 0
+        if keep is False:
+            return in_group
+        positions = np.arange(self.n_rows)
+        if keep == 'last':
+            positions = positions[::-1]
+        first = np.zeros(self.n_rows, dtype=bool)
+        _, first_positions = np.unique(self.group_ids[positions][in_group[positions]], return_index=True)
+        first[positions[in_group[positions]][first_positions]] = True
+        return in_group & ~first
+
+    def group_positions(self, group):
+        return np.flatnonzero(self.group_ids == group)
+
+    def groups_frame(self, limit=GROUP_PREVIEW):
+        """Крупнейшие группы: номер, размер и позиция первой строки."""
+        members = np.flatnonzero(self.group_ids >= 0)
+        _, first = np.unique(self.group_ids[members], return_index=True)
+        shown = min(limit, self.n_groups)
+        return pd.DataFrame({
+            'Группа': np.arange(1, shown + 1),
+            'Размер группы': self.group_sizes[:shown],
+            'Первая строка': members[first[:shown]]
+        })
+
+    def size_distribution(self):
+        """Число групп каждого размера."""
+        sizes, counts = np.unique(self.group_sizes, return_counts=True)
+        return pd.Series(counts, index=pd.Index(sizes, name='Размер группы'), name='Групп')
+
+
+def build_duplicate_index(df, columns=None, normalize_text=False, round_digits=None, engine=None,
+                          chunk_rows=ROW_CHUNK, timings=None):
+    """Индекс дубликатов по всем столбцам или по подмножеству columns.
+
+    С normalize_text/round_digits строки сравниваются после нормализации -
+    так находятся почти-дубликаты (разный регистр, пробелы, мелкие расхождения чисел).
+    """
+    frame = df if columns is None else df[list(columns)]
+    if normalize_text or round_digits is not None:
+        frame = normalize_rows(frame, normalize_text, round_digits)
+    return DuplicateIndex(hash_rows(frame, engine, chunk_rows, timings), frame)
@@ -0,0 +1,190 @@
+"""Чтение книг Excel: список листов без разбора, выбранный лист и дисковый кэш листов."""
+import hashlib
+import importlib.util
+import io
+import os
+import re
+import tempfile
+import time
+import zipfile
+from xml.etree import ElementTree
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import xlrd
+
+from columnar import read_columnar
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+# python-calamine (Rust) разбирает xlsx в разы быстрее openpyxl (есть в requirements.txt);
+# openpyxl и xlrd остаются запасным вариантом для окружений без него
+EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') is not None else 'openpyxl'
+SHEET_CACHE_DIR = os.environ.get('ANALYSIS_SHEET_CACHE_DIR',
+                                 os.path.join(tempfile.gettempdir(), 'analysis_sheet_cache'))
+SHEET_CACHE_BYTES = int(os.environ.get('ANALYSIS_SHEET_CACHE_MB', '1024')) * 1024 ** 2
+SHEET_CACHE_MAX_AGE = float(os.environ.get('ANALYSIS_SHEET_CACHE_DAYS', '7')) * 24 * 3600
+SHEET_CACHE_COMPRESSION = 'lz4' if pa.Codec.is_available('lz4') else 'uncompressed'
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PACKAGE_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_DIMENSION = re.compile(rb'<(?:\w+:)?dimension ref="([A-Z]+\d+(?::[A-Z]+\d+)?)"')
+_CELL = re.compile(r'([A-Z]+)(\d+)')
+DIMENSION_SCAN_BYTES = 4096
+
+
+def is_excel(name):
+    return name.lower().endswith(EXCEL_EXTENSIONS)
+
+
+def _sheet_dimension(archive, member):
+    """Диапазон из тега <dimension> в начале XML листа - без чтения ячеек."""
+    try:
+        with archive.open(member) as sheet_xml:
+            match = _DIMENSION.search(sheet_xml.read(DIMENSION_SCAN_BYTES))
+    except KeyError:
+        return None
+    return match.group(1).decode('ascii') if match else None
+
+
+def _xlsx_sheets(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        relations = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        targets = {rel.get('Id'): rel.get('Target') for rel in relations.iter(f'{_PACKAGE_REL_NS}Relationship')}
+        sheets = []
+        for sheet in workbook.iter(f'{_MAIN_NS}sheet'):
+            target = targets.get(sheet.get(f'{_REL_NS}id'), '')
+            member = target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+            sheets.append((sheet.get('name'), _sheet_dimension(archive, member)))
+        return sheets
+
+
+def list_sheets(name, data):
+    """[(имя листа, диапазон вида 'A1:F100' или None)] без разбора содержимого листов."""
+    if name.lower().endswith('.xlsx'):
+        return _xlsx_sheets(data)
+    workbook = xlrd.open_workbook(file_contents=data, on_demand=True)
+    try:
+        return [(sheet_name, None) for sheet_name in workbook.sheet_names()]
+    finally:
+        workbook.release_resources()
+
+
+def _column_number(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
+
+
+def cell_range(ref):
+    """'B3:F200' -> (первая строка, последняя строка, первый столбец, последний столбец), с единицы."""
+    first, _, last = ref.partition(':')
+    first_col, first_row = _CELL.fullmatch(first).groups()
+    last_col, last_row = _CELL.fullmatch(last or first).groups()
+    return int(first_row), int(last_row), _column_number(first_col), _column_number(last_col)
+
+
+def read_sheet(name, data, sheet=None, used_range=None):
+    """Разбирает один лист; used_range ('B3:F200') ограничивает читаемые строки и столбцы.
+
+    Первая строка диапазона считается заголовком, поэтому таблицы, начинающиеся
+    не с A1, читаются без пустых столбцов и строк.
+    """
+    engine = 'xlrd' if name.lower().endswith('.xls') and EXCEL_ENGINE == 'openpyxl' else EXCEL_ENGINE
+    options = {}
+    if used_range:
+        first_row, last_row, first_col, last_col = cell_range(used_range)
+        options = {'skiprows': first_row - 1, 'nrows': last_row - first_row,
+                   'usecols': list(range(first_col - 1, last_col))}
+    return pd.read_excel(io.BytesIO(data), sheet_name=0 if sheet is None else sheet, engine=engine, **options)
+
+
+def sheet_cache_path(workbook_key, sheet, used_range):
+    variant = hashlib.blake2b(repr((sheet, used_range)).encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(SHEET_CACHE_DIR, f"{workbook_key}_{variant}.feather")
+
+
+def sheet_cache_dir(cache_dir=SHEET_CACHE_DIR):
+    """Каталог кэша листов, доступный только текущему пользователю, или None.
+
+    Каталог, созданный другим пользователем или открытый для других, не
+    используется: в нем лежат данные загруженных книг.
+    """
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        info = os.stat(cache_dir)
+        if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+            return None
+        if info.st_mode & 0o077:
+            os.chmod(cache_dir, 0o700)
+    except OSError:
+        return None
+    return cache_dir
+
+
+def prune_sheet_cache(cache_dir=SHEET_CACHE_DIR, max_bytes=SHEET_CACHE_BYTES, max_age=SHEET_CACHE_MAX_AGE):
+    """Удаляет листы старше max_age секунд, затем самые давно открытые - пока объем больше max_bytes."""
+    entries = []
+    now = time.time()
+    for entry in os.scandir(cache_dir):
+        if not entry.name.endswith('.feather'):
+            continue
+        try:
+            info = entry.stat()
+            if now - info.st_mtime > max_age:
+                os.remove(entry.path)
+            else:
+                entries.append((info.st_mtime, info.st_size, entry.path))
+        except OSError:
+            continue
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def load_sheet(name, data, sheet=None, used_range=None, workbook_key=None):
+    """Лист книги с кэшем на диске в формате Feather (сжатие lz4) по хэшу книги.
+
+    Повторное открытие того же листа (в том числе после перезапуска сервера)
+    читает готовый колоночный файл. Кэш ограничен по объему и возрасту файлов
+    (ANALYSIS_SHEET_CACHE_MB, ANALYSIS_SHEET_CACHE_DAYS). Листы, которые не
+    переводятся в Arrow без потерь (смешанные типы, нестроковые заголовки),
+    не кэшируются.
+    """
+    cache_dir = sheet_cache_dir() if workbook_key is not None else None
+    if cache_dir is None:
+        return read_sheet(name, data, sheet, used_range)
+
+    path = sheet_cache_path(workbook_key, sheet, used_range)
+    if os.path.exists(path):
+        try:
+            df = read_columnar(path, path=path)
+            # Время изменения - время последнего открытия, по нему вытесняются старые листы
+            os.utime(path)
+            return df
+        except (pa.ArrowException, OSError):
+            pass
+
+    df = read_sheet(name, data, sheet, used_range)
+    if all(isinstance(col, str) for col in df.columns) and isinstance(df.index, pd.RangeIndex):
+        partial_path = None
+        try:
+            # Уникальный файл (mkstemp, права 0o600): сессии - потоки одного процесса
+            handle, partial_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            os.close(handle)
+            feather.write_feather(df, partial_path, compression=SHEET_CACHE_COMPRESSION)
+            os.replace(partial_path, path)
+            prune_sheet_cache(cache_dir)
+        except (pa.ArrowException, OSError, ValueError):
+            if partial_path is not None and os.path.exists(partial_path):
+                os.remove(partial_path)
+    return df
@@ -0,0 +1,75 @@
+"""Выгрузка таблиц в файл частями: CSV (в том числе gzip и zstd) и Parquet.
+
+Данные пишутся во временный файл порциями по chunk_rows строк, поэтому в
+памяти одновременно находятся только одна порция и сжатый поток, а не вся
+таблица в виде строки CSV.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EXPORT_CHUNK_ROWS = 100_000
+EXPORT_DIR = os.environ.get('ANALYSIS_EXPORT_DIR')
+
+EXPORT_FORMATS = {
+    'csv': ('CSV', '.csv', 'text/csv'),
+    'csv.gz': ('CSV (gzip)', '.csv.gz', 'application/gzip'),
+    'csv.zst': ('CSV (zstd)', '.csv.zst', 'application/zstd'),
+    'parquet': ('Parquet', '.parquet', 'application/vnd.apache.parquet')
+}
+_CSV_CODECS = {'csv': None, 'csv.gz': 'gzip', 'csv.zst': 'zstd'}
+
+
+def available_formats():
+    """Форматы, для которых в сборке pyarrow есть нужный кодек."""
+    return [fmt for fmt in EXPORT_FORMATS
+            if _CSV_CODECS.get(fmt) is None or pa.Codec.is_available(_CSV_CODECS[fmt])]
+
+
+def csv_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS, encoding='utf-8'):
+    """Байты CSV по частям; заголовок - только в первой части."""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=start == 0).encode(encoding)
+
+
+def write_csv(df, path, codec=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    stream = pa.CompressedOutputStream(path, codec) if codec else pa.OSFile(path, mode='wb')
+    with stream:
+        for chunk in csv_chunks(df, chunk_rows):
+            stream.write(chunk)
+
+
+def write_parquet(df, path, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Parquet с группой строк на каждую порцию; сжатие zstd, если доступно."""
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    compression = 'zstd' if pa.Codec.is_available('zstd') else 'snappy'
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+@contextmanager
+def export_file(df, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Временный файл с выгрузкой df в формате fmt, открытый на чтение с начала.
+
+    Файл удаляется при выходе из контекста.
+    """
+    handle, path = tempfile.mkstemp(suffix=EXPORT_FORMATS[fmt][1], dir=EXPORT_DIR)
+    os.close(handle)
+    try:
+        if fmt == 'parquet':
+            write_parquet(df, path, chunk_rows)
+        else:
+            write_csv(df, path, _CSV_CODECS[fmt], chunk_rows)
+        with open(path, 'rb') as exported:
+            yield exported
+    finally:
+        os.remove(path)
+
+
+def export_name(stem, fmt):
+    return stem + EXPORT_FORMATS[fmt][1]
@@ -0,0 +1,246 @@
+"""Гистограммы, диаграммы размаха и оценки плотности, посчитанные на сервере.
+
+Графики строятся по агрегатам, поэтому объем передаваемых в браузер данных
+не зависит от числа строк в таблице. Матрица пар вместо точек рисует
+двумерные гистограммы: каждый столбец один раз переводится в номера
+интервалов, а счетчики пары - один np.bincount по объединенным номерам.
+"""
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from memo import memoize
+
+HIST_BINS = 30
+KDE_GRID_POINTS = 256
+KDE_BINS = 2048
+MAX_OUTLIER_POINTS = 100
+PAIR_BINS = 40
+
+
+def finite_values(series):
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return values[np.isfinite(values)]
+
+
+def histogram_counts(values, bins=HIST_BINS):
+    counts, edges = np.histogram(values, bins=bins)
+    return {'counts': counts, 'edges': edges}
+
+
+def box_stats(values, q1, median, q3):
+    """Статистики для диаграммы размаха по заранее известным квартилям.
+
+    Усы доходят до крайних значений внутри [Q1 - 1.5 * IQR, Q3 + 1.5 * IQR];
+    из выбросов сохраняются не более MAX_OUTLIER_POINTS самых крайних.
+    """
+    iqr = q3 - q1
+    lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    is_outlier = (values < lower) | (values > upper)
+    inside = values[~is_outlier]
+    outliers = values[is_outlier]
+
+    if len(outliers) > MAX_OUTLIER_POINTS:
+        half = MAX_OUTLIER_POINTS // 2
+        outliers = np.partition(outliers, (half, len(outliers) - half - 1))
+        outliers = np.concatenate([outliers[:half], outliers[-half:]])
+
+    return {
+        'q1': q1, 'median': median, 'q3': q3,
+        'lowerfence': inside.min() if len(inside) else q1,
+        'upperfence': inside.max() if len(inside) else q3,
+        'mean': values.mean() if len(values) else np.nan,
+        'outliers': outliers,
+        'outlier_count': int(is_outlier.sum())
+    }
+
+
+def kde_curve(values, iqr=None, grid_points=KDE_GRID_POINTS, bins=KDE_BINS):
+    """Гауссова оценка плотности по бинированным данным (правило Сильвермана).
+
+    iqr можно передать из уже посчитанных квартилей, чтобы не сортировать столбец.
+    """
+    n = len(values)
+    if n < 2 or values.min() == values.max():
+        return {'grid': np.array([]), 'density': np.array([])}
+
+    if iqr is None:
+        q1, q3 = np.percentile(values, [25, 75])
+        iqr = q3 - q1
+    spread = min(values.std(), iqr / 1.34) or values.std()
+    bandwidth = 0.9 * spread * n ** -0.2
+
+    low, high = values.min() - 3 * bandwidth, values.max() + 3 * bandwidth
+    counts, edges = np.histogram(values, bins=bins, range=(low, high))
+    bin_width = edges[1] - edges[0]
+    half_width = int(np.ceil(4 * bandwidth / bin_width))
+    offsets = np.arange(-half_width, half_width + 1) * bin_width
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    density = np.convolve(counts, kernel, mode='same')[:bins] / n
+
+    centers = (edges[:-1] + edges[1:]) / 2
+    grid = np.linspace(low, high, grid_points)
+    return {'grid': grid, 'density': np.interp(grid, centers, density)}
+
+
+def column_histogram(df, col, bins=HIST_BINS):
+    return memoize(df, ('histogram', col, bins), lambda: histogram_counts(finite_values(df[col]), bins))
+
+
+def column_box_stats(df, col, quartiles):
+    """quartiles - (Q1, медиана, Q3), обычно из кэшированного профиля."""
+    quartiles = tuple(float(q) for q in quartiles)
+    return memoize(df, ('box', col, quartiles), lambda: box_stats(finite_values(df[col]), *quartiles))
+
+
+def column_kde(df, col, iqr=None):
+    """iqr влияет на ширину окна, поэтому входит в ключ: точные и приближенные квартили дают разные кривые."""
+    iqr = None if iqr is None else float(iqr)
+    return memoize(df, ('kde', col, iqr), lambda: kde_curve(finite_values(df[col]), iqr=iqr))
+
+
+def bin_codes(values, bins=PAIR_BINS):
+    """Номера равных интервалов между минимумом и максимумом (-1 - пропуск) и границы интервалов."""
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.full(len(values), -1, dtype=np.int16), np.linspace(0.0, 1.0, bins + 1)
+    low, high = values[finite].min(), values[finite].max()
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    edges = np.linspace(low, high, bins + 1)
+    codes = np.full(len(values), -1, dtype=np.int16)
+    codes[finite] = np.clip(((values[finite] - low) / (high - low) * bins).astype(np.int64), 0, bins - 1)
+    return codes, edges
+
+
+def pair_counts(x_codes, y_codes, bins=PAIR_BINS):
+    """Двумерная гистограмма bins x bins (строки - интервалы y) по строкам без пропусков в обоих столбцах."""
+    valid = (x_codes >= 0) & (y_codes >= 0)
+    flat = y_codes[valid].astype(np.int64) * bins + x_codes[valid]
+    return np.bincount(flat, minlength=bins * bins).reshape(bins, bins)
+
+
+def column_bin_codes(df, col, bins=PAIR_BINS):
+    return memoize(df, ('bin_codes', col, bins),
+                   lambda: bin_codes(df[col].to_numpy(dtype=np.float64, na_value=np.nan), bins))
+
+
+def pair_histograms(df, cols, bins=PAIR_BINS):
+    """Счетчики для матрицы пар столбцов cols.
+
+    Возвращает {'edges': {col: границы}, 'diagonal': {col: счетчики},
+    'pairs': {(x, y): матрица bins x bins}}. Каждая пара кэшируется
+    отдельно, так что добавление столбца считает только новые пары.
+    """
+    codes = {col: column_bin_codes(df, col, bins) for col in cols}
+    pairs = {}
+    for i, y in enumerate(cols):
+        for x in cols[:i]:
+            pairs[(x, y)] = memoize(df, ('pair_counts', x, y, bins),
+                                    lambda: pair_counts(codes[x][0], codes[y][0], bins))
+    return {
+        'edges': {col: codes[col][1] for col in cols},
+        'diagonal': {col: np.bincount(codes[col][0][codes[col][0] >= 0], minlength=bins) for col in cols},
+        'pairs': pairs
+    }
+
+
+def _box_trace(stats, name, color, orientation='v', position=None, width=None):
+    quartile_kwargs = {k: [stats[k]] for k in ('q1', 'median', 'q3', 'lowerfence', 'upperfence', 'mean')}
+    axis_kwargs = {'y': [position if position is not None else name]} if orientation == 'h' else \
+        {'x': [position if position is not None else name]}
+    return go.Box(name=name, orientation=orientation, marker_color=color, line_color=color,
+                  boxpoints=False, showlegend=False, width=width, **quartile_kwargs, **axis_kwargs)
+
+
+def _outlier_trace(stats, name, color, orientation='v', position=None):
+    points = stats['outliers']
+    labels = [position if position is not None else name] * len(points)
+    x, y = (points, labels) if orientation == 'h' else (labels, points)
+    return go.Scatter(x=x, y=y, mode='markers', marker=dict(color=color, size=4, opacity=0.7),
+                      name=f"{name}: выбросы", showlegend=False,
+                      hovertemplate=f"{name}: %{{{'x' if orientation == 'h' else 'y'}}}<extra>выброс</extra>")
+
+
+def histogram_figure(hist, col, title, color='#1f77b4', box=None, opacity=0.7):
+    """Гистограмма по счетчикам; при заданном box сверху добавляется диаграмма размаха."""
+    edges = hist['edges']
+    bar = go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=hist['counts'], width=np.diff(edges),
+                 marker_color=color, opacity=opacity, name=col, showlegend=False,
+                 customdata=np.column_stack([edges[:-1], edges[1:]]),
+                 hovertemplate='[%{customdata[0]:.4g}, %{customdata[1]:.4g}): %{y}<extra></extra>')
+
+    if box is None:
+        fig = go.Figure(bar)
+        fig.update_layout(title=title, xaxis_title=col, yaxis_title='count', bargap=0)
+        return fig
+
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.2, 0.8], vertical_spacing=0.02)
+    fig.add_trace(_box_trace(box, col, color, orientation='h'), row=1, col=1)
+    fig.add_trace(_outlier_trace(box, col, color, orientation='h'), row=1, col=1)
+    fig.add_trace(bar, row=2, col=1)
+    fig.update_yaxes(showticklabels=False, row=1, col=1)
+    fig.update_xaxes(title_text=col, row=2, col=1)
+    fig.update_yaxes(title_text='count', row=2, col=1)
+    fig.update_layout(title=title, bargap=0)
+    return fig
+
+
+def box_figure(stats_by_col, title, color='#ff7f0e'):
+    fig = go.Figure()
+    for col, stats in stats_by_col.items():
+        fig.add_trace(_box_trace(stats, col, color))
+        fig.add_trace(_outlier_trace(stats, col, color))
+    fig.update_layout(title=title, xaxis_title='variable', yaxis_title='value')
+    return fig
+
+
+def violin_figure(kde_by_col, stats_by_col, title, color='#2ca02c'):
+    """Violin plot из предвычисленных плотностей с диаграммой размаха внутри."""
+    fig = go.Figure()
+    for position, (col, kde) in enumerate(kde_by_col.items()):
+        density = kde['density']
+        if len(density):
+            half_width = 0.4 * density / density.max()
+            fig.add_trace(go.Scatter(
+                x=np.concatenate([position - half_width, (position + half_width)[::-1]]),
+                y=np.concatenate([kde['grid'], kde['grid'][::-1]]),
+                fill='toself', mode='lines', line=dict(color=color, width=1), opacity=0.6,
+                name=col, showlegend=False, hoverinfo='skip'))
+        fig.add_trace(_box_trace(stats_by_col[col], col, color, position=position, width=0.1))
+    fig.update_layout(title=title, yaxis_title='value',
+                      xaxis=dict(tickmode='array', tickvals=list(range(len(kde_by_col))),
+                                 ticktext=list(kde_by_col), title='variable'))
+    return fig
+
+
+def pair_density_figure(hist, title, colorscale='Viridis'):
+    """Матрица пар: под диагональю - тепловые карты log10 числа строк, на диагонали - гистограммы."""
+    cols = list(hist['edges'])
+    k = len(cols)
+    spacing = min(0.02, 0.2 / k)
+    fig = make_subplots(rows=k, cols=k, horizontal_spacing=spacing, vertical_spacing=spacing)
+    centers = {col: (edges[:-1] + edges[1:]) / 2 for col, edges in hist['edges'].items()}
+
+    for i, y in enumerate(cols):
+        fig.add_trace(go.Bar(x=centers[y], y=hist['diagonal'][y], width=np.diff(hist['edges'][y]),
+                             marker_color='#1f77b4', showlegend=False, name=y,
+                             hovertemplate=f'{y}: %{{x:.4g}}<br>строк: %{{y}}<extra></extra>'),
+                      row=i + 1, col=i + 1)
+        for j, x in enumerate(cols[:i]):
+            counts = hist['pairs'][(x, y)]
+            with np.errstate(divide='ignore'):
+                z = np.where(counts > 0, np.log10(counts), np.nan)
+            fig.add_trace(go.Heatmap(x=centers[x], y=centers[y], z=z, customdata=counts, coloraxis='coloraxis',
+                                     hovertemplate=f'{x}: %{{x:.4g}}<br>{y}: %{{y:.4g}}<br>'
+                                                   'строк: %{customdata}<extra></extra>'),
+                          row=i + 1, col=j + 1)
+
+    for position, col in enumerate(cols):
+        fig.update_xaxes(title_text=col, row=k, col=position + 1)
+        fig.update_yaxes(title_text=col if position else None, row=position + 1, col=1)
+    fig.update_xaxes(showticklabels=k <= 6)
+    fig.update_yaxes(showticklabels=k <= 6)
+    fig.update_layout(title=title, bargap=0, coloraxis=dict(colorscale=colorscale,
+                                                             colorbar=dict(title='log10(строк)')))
+    return fig
@@ -0,0 +1,119 @@
+"""Статистики числовых переменных в разрезе категорий.
+
+Полная таблица (все категории x все числовые столбцы) считается одной
+группировкой и кэшируется по набору данных. Для графиков категории
+ограничиваются top_n самыми частыми, остальные объединяются в группу
+OTHER_LABEL, поэтому размер фигуры не зависит от числа категорий.
+"""
+import numpy as np
+import pandas as pd
+
+from figure_aggregates import box_stats
+from memo import memoize
+
+TOP_CATEGORIES = 20
+OTHER_LABEL = 'Другие'
+GROUP_STATS = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+
+class GroupAggregates:
+    """Статистики GROUP_STATS для каждой пары (категория, числовой столбец).
+
+    Категории упорядочены по убыванию числа строк (sizes).
+    """
+
+    def __init__(self, sizes, stats):
+        self.sizes = sizes
+        self.stats = stats
+
+    def column(self, col):
+        """Таблица категории x GROUP_STATS для одного числового столбца."""
+        return self.stats[col]
+
+    def top_categories(self, n=TOP_CATEGORIES):
+        return self.sizes.index[:n]
+
+
+def _finite_column(series):
+    """Столбец как float64 с NaN вместо бесконечностей; копируется, только если это нужно."""
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    if np.isinf(values).any():
+        values = np.where(np.isfinite(values), values, np.nan)
+    return values
+
+
+def group_statistics(df, cat_col, numeric_cols):
+    """Все статистики по всем категориям cat_col и всем numeric_cols за один проход группировки."""
+    values = pd.DataFrame({col: _finite_column(df[col]) for col in numeric_cols}, index=df.index, copy=False)
+    grouped = values.groupby(df[cat_col], observed=True, dropna=True)
+    moments = grouped.agg(['count', 'mean', 'std', 'min', 'max'])
+    quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    quartiles.columns = pd.MultiIndex.from_tuples([(col, f"{q * 100:g}%") for col, q in quartiles.columns])
+
+    sizes = df.groupby(cat_col, observed=True, dropna=True).size().sort_values(ascending=False, kind='stable')
+    stats = pd.concat([moments, quartiles], axis=1)
+    stats = stats.reindex(index=sizes.index,
+                          columns=pd.MultiIndex.from_product([list(numeric_cols), GROUP_STATS]))
+    return GroupAggregates(sizes, stats)
+
+
+def cached_group_statistics(df, cat_col, numeric_cols):
+    return memoize(df, ('group_stats', cat_col, tuple(numeric_cols)),
+                   lambda: group_statistics(df, cat_col, numeric_cols))
+
+
+def bucket_codes(series, top):
+    """Номер группы для каждой строки: позиция в top, len(top) - прочие категории, -1 - пропуск."""
+    codes = pd.Categorical(series, categories=top).codes.astype(np.int64)
+    codes[(codes < 0) & series.notna().to_numpy()] = len(top)
+    return codes
+
+
+def bucket_labels(top):
+    """Подписи категорий top и группы прочих, различающиеся между собой.
+
+    Совпадающие подписи (категории 1 и '1', настоящая категория OTHER_LABEL)
+    получают номер, чтобы не слиться в одну группу на графике.
+    """
+    labels = []
+    for label in [str(category) for category in top] + [OTHER_LABEL]:
+        unique, number = label, 2
+        while unique in labels:
+            unique, number = f"{label} ({number})", number + 1
+        labels.append(unique)
+    return labels
+
+
+def bucketed_box_stats(df, cat_col, numeric_col, top):
+    """Статистики диаграммы размаха по категориям top и группе OTHER_LABEL.
+
+    Строки сортируются по группе один раз, дальше каждая группа - непрерывный
+    срез, по которому считаются квартили, усы и крайние выбросы.
+    """
+    codes = bucket_codes(df[cat_col], top)
+    values = df[numeric_col].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = (codes >= 0) & np.isfinite(values)
+    codes, values = codes[valid], values[valid]
+
+    order = np.argsort(codes, kind='stable')
+    codes, values = codes[order], values[order]
+    bounds = np.searchsorted(codes, np.arange(len(top) + 2))
+    labels = bucket_labels(top)
+
+    boxes = {}
+    for group, label in enumerate(labels):
+        group_values = values[bounds[group]:bounds[group + 1]]
+        if len(group_values):
+            stats = box_stats(group_values, *np.percentile(group_values, [25, 50, 75]))
+            stats['count'] = len(group_values)
+            boxes[label] = stats
+    return boxes
+
+
+def cached_bucketed_box_stats(df, cat_col, numeric_col, top_n=TOP_CATEGORIES):
+    """Диаграммы размаха для top_n самых частых категорий и группы прочих (кэшируются)."""
+    def compute():
+        top = df[cat_col].value_counts(dropna=True).index[:top_n]
+        return bucketed_box_stats(df, cat_col, numeric_col, top)
+
+    return memoize(df, ('group_boxes', cat_col, numeric_col, top_n), compute)
@@ -0,0 +1,161 @@
+"""Режим профилирования: время, число строк и память по разделам отчета и тяжелым вызовам.
+
+Пока трассировка не запущена, span() ничего не делает, поэтому точки замера
+можно оставлять в коде постоянно. Память считается через tracemalloc -
+это замедляет вычисления, поэтому режим включается явно. Трассировки
+разных сессий делят один tracemalloc: он останавливается, когда завершается
+последняя из них, а пик памяти сбрасывается, только пока трассировка одна -
+при параллельных трассировках пики замеров - оценка сверху.
+"""
+import contextvars
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+_ACTIVE_TRACE = contextvars.ContextVar('active_trace', default=None)
+_TRACING_LOCK = threading.Lock()
+_tracing = {'traces': 0, 'owned': False}
+
+
+def _reset_peak():
+    """Сбрасывает пик tracemalloc, если он не нужен другой трассировке."""
+    with _TRACING_LOCK:
+        if _tracing['traces'] == 1:
+            tracemalloc.reset_peak()
+
+
+class Span:
+    __slots__ = ('name', 'kind', 'depth', 'rows', 'offset', 'seconds', 'peak_bytes', 'net_bytes',
+                 '_start', '_start_bytes', '_max_bytes')
+
+    def __init__(self, name, kind, depth, rows, offset, start_bytes):
+        self.name = name
+        self.kind = kind
+        self.depth = depth
+        self.rows = rows
+        self.offset = offset
+        self.seconds = None
+        self.peak_bytes = None
+        self.net_bytes = None
+        self._start = time.perf_counter()
+        self._start_bytes = start_bytes
+        self._max_bytes = start_bytes
+
+    def as_dict(self):
+        return {'name': self.name, 'kind': self.kind, 'depth': self.depth, 'rows': self.rows,
+                'offset': self.offset, 'seconds': self.seconds, 'peak_bytes': self.peak_bytes,
+                'net_bytes': self.net_bytes}
+
+
+class Trace:
+    """Дерево замеров одного запуска скрипта.
+
+    Пик памяти вложенного замера переносится в родительский, поэтому пик
+    раздела учитывает все вызовы внутри него, хотя tracemalloc хранит один
+    общий пик на процесс.
+    """
+
+    def __init__(self):
+        self.started = pd.Timestamp.now()
+        self.spans = []
+        self.token = None
+        self._stack = []
+        self._origin = time.perf_counter()
+
+    def open(self, name, kind='call', rows=None):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            parent = self._stack[-1]
+            parent._max_bytes = max(parent._max_bytes, peak)
+        _reset_peak()
+        span = Span(name, kind, len(self._stack), rows, time.perf_counter() - self._origin, current)
+        self.spans.append(span)
+        self._stack.append(span)
+        return span
+
+    def close(self, span):
+        span.seconds = time.perf_counter() - span._start
+        current, peak = tracemalloc.get_traced_memory()
+        absolute_peak = max(span._max_bytes, peak)
+        span.peak_bytes = absolute_peak - span._start_bytes
+        span.net_bytes = current - span._start_bytes
+        self._stack.pop()
+        if self._stack:
+            parent = self._stack[-1]
+            parent._max_bytes = max(parent._max_bytes, absolute_peak)
+        _reset_peak()
+
+    def frame(self):
+        """Таблица завершенных замеров для отображения; вложенность показана отступом в имени."""
+        spans = self.closed_spans()
+        return pd.DataFrame({
+            'Раздел / вызов': ['· ' * span.depth + span.name for span in spans],
+            'Время, с': [span.seconds for span in spans],
+            'Строк': pd.array([span.rows for span in spans], dtype='Int64'),
+            'Пик памяти, МБ': [span.peak_bytes / 1024 ** 2 for span in spans],
+            'Прирост памяти, МБ': [span.net_bytes / 1024 ** 2 for span in spans]
+        })
+
+    def closed_spans(self):
+        """Замеры, которые успели завершиться (незавершенные остаются без времени и памяти)."""
+        return [span for span in self.spans if span.seconds is not None]
+
+    def to_json(self):
+        return json.dumps({'started': self.started.isoformat(),
+                           'spans': [span.as_dict() for span in self.closed_spans()]},
+                          ensure_ascii=False, indent=2)
+
+
+@contextmanager
+def span(name, kind='call', rows=None):
+    trace = _ACTIVE_TRACE.get()
+    if trace is None:
+        yield
+        return
+    opened = trace.open(name, kind, rows)
+    try:
+        yield
+    finally:
+        trace.close(opened)
+
+
+def _row_count(args):
+    return len(args[0]) if args and isinstance(args[0], pd.DataFrame) else None
+
+
+def traced(func):
+    """Замер раздела отчета; число строк берется из первого аргумента-DataFrame."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _ACTIVE_TRACE.get() is None:
+            return func(*args, **kwargs)
+        with span(func.__name__, kind='section', rows=_row_count(args)):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def start_trace():
+    """Запускает трассировку текущего потока (запуска скрипта) и возвращает Trace."""
+    with _TRACING_LOCK:
+        if not _tracing['traces']:
+            _tracing['owned'] = not tracemalloc.is_tracing()
+            if _tracing['owned']:
+                tracemalloc.start()
+        _tracing['traces'] += 1
+    trace = Trace()
+    trace.token = _ACTIVE_TRACE.set(trace)
+    return trace
+
+
+def stop_trace(trace):
+    _ACTIVE_TRACE.reset(trace.token)
+    with _TRACING_LOCK:
+        _tracing['traces'] -= 1
+        if not _tracing['traces'] and _tracing['owned']:
+            tracemalloc.stop()
+            _tracing['owned'] = False
@@ -0,0 +1,97 @@
+"""Загрузка исходных файлов в процессный реестр разобранных таблиц (см. registry)."""
+import hashlib
+import io
+import os
+
+import pandas as pd
+
+from columnar import COLUMNAR_EXTENSIONS, is_columnar, read_columnar
+from datetimes import parse_datetime_columns
+from dtype_optimizer import optimize_dtypes
+from excel import is_excel, load_sheet
+from memo import get_memo
+from registry import frame_nbytes, get_registry
+
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xls') + COLUMNAR_EXTENSIONS
+
+
+def content_hash(data):
+    """Хэш содержимого файла - ключ кэша, не зависящий от имени и сессии."""
+    return hashlib.blake2b(memoryview(data), digest_size=16).hexdigest()
+
+
+def parse_bytes(name, data, columns=None, sheet=None, used_range=None, workbook_key=None):
+    """Разбирает содержимое файла; строковые столбцы с датами переводятся в datetime64.
+
+    columns поддерживается только колоночными форматами, sheet и used_range -
+    только книгами Excel (см. excel.load_sheet).
+    """
+    if is_columnar(name):
+        df = read_columnar(name, data=data, columns=columns)
+    elif is_excel(name):
+        df = load_sheet(name, data, sheet, used_range, workbook_key)
+    elif name.lower().endswith('.csv'):
+        df = pd.read_csv(io.BytesIO(data))
+    else:
+        raise ValueError(f"Неподдерживаемый формат файла: {name}")
+    return parse_datetime_columns(df)
+
+
+def _variant_key(key, columns=None, sheet=None, used_range=None):
+    """Ключ таблицы, прочитанной с выбором столбцов или листа."""
+    if columns is None and sheet is None and used_range is None:
+        return key
+    variant = repr((None if columns is None else list(columns), sheet, used_range))
+    return f"{key}:{content_hash(variant.encode('utf-8'))}"
+
+
+def _load_cached(key, parse, optimize, registry, holder):
+    registry = get_registry() if registry is None else registry
+    if optimize:
+        key = f"{key}:optimized"
+
+    df = registry.get(key, holder)
+    if df is None:
+        df = parse()
+        df.attrs['dataset_key'] = key
+        if optimize:
+            memory_before = frame_nbytes(df)
+            df, report = optimize_dtypes(df)
+            df.attrs['memory_before'] = memory_before
+            get_memo().get_or_compute(key, 'dtype_report', lambda: report)
+        df = registry.put(key, df, holder)
+
+    return df, key
+
+
+def load_uploaded_file(uploaded_file, optimize=False, registry=None, columns=None, sheet=None, used_range=None,
+                       holder=None):
+    """Возвращает (df, ключ набора данных) для загруженного файла.
+
+    Повторные запуски скрипта и другие сессии с тем же содержимым получают
+    представление уже разобранной таблицы из реестра, а holder (идентификатор
+    сессии) начинает ее держать. При optimize=True в кэш попадает
+    таблица с компактными типами (см. dtype_optimizer), а исходный объем
+    памяти сохраняется в df.attrs['memory_before']. columns - список
+    читаемых столбцов для колоночных форматов, sheet и used_range - лист
+    и диапазон ячеек книги Excel.
+    """
+    data = uploaded_file.getvalue()
+    file_key = content_hash(data)
+    key = _variant_key(file_key, columns, sheet, used_range)
+    return _load_cached(key, lambda: parse_bytes(uploaded_file.name, data, columns, sheet, used_range, file_key),
+                        optimize, registry, holder)
+
+
+def load_local_file(path, optimize=False, registry=None, columns=None, holder=None):
+    """Как load_uploaded_file, но для колоночного файла на диске, читаемого через отображение в память.
+
+    Ключ строится по пути, размеру и времени изменения, чтобы не читать файл
+    целиком ради хэша.
+    """
+    stat = os.stat(path)
+    identity = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8')
+    key = _variant_key(content_hash(identity), columns)
+    return _load_cached(key, lambda: parse_datetime_columns(read_columnar(path, path=path, columns=columns)), optimize,
+                        registry, holder)
+
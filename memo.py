@@ -0,0 +1,81 @@
+"""Мемоизация производных результатов по ключу набора данных."""
+import threading
+from collections import OrderedDict
+
+from instrumentation import span
+
+MAX_DATASETS = 8
+
+
+def dataset_key(df):
+    return df.attrs.get('dataset_key')
+
+
+class DatasetMemo:
+    """Хранит вычисленные для набора данных объекты (профиль, корреляции и т.д.).
+
+    Ключ верхнего уровня - хэш содержимого набора данных, поэтому результаты
+    общие для всех сессий и переживают перезапуски скрипта. Наборы данных
+    вытесняются в порядке LRU.
+    """
+
+    def __init__(self, max_datasets=MAX_DATASETS):
+        self.max_datasets = max_datasets
+        self._datasets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, name, compute):
+        if key is None:
+            return compute()
+
+        with self._lock:
+            results = self._datasets.get(key)
+            if results is not None:
+                self._datasets.move_to_end(key)
+                if name in results:
+                    return results[name]
+
+        value = compute()
+
+        with self._lock:
+            results = self._datasets.setdefault(key, {})
+            self._datasets.move_to_end(key)
+            value = results.setdefault(name, value)
+            while len(self._datasets) > self.max_datasets:
+                self._datasets.popitem(last=False)
+        return value
+
+    def peek(self, key, name, default=None):
+        """Ранее сохраненный результат без вычисления."""
+        with self._lock:
+            return self._datasets.get(key, {}).get(name, default)
+
+    def drop(self, key):
+        with self._lock:
+            self._datasets.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._datasets.clear()
+
+
+_MEMO = DatasetMemo()
+
+
+def memoize(df, name, compute):
+    """Возвращает результат compute() для df, вычисляя его не более одного раза.
+
+    name должен однозначно описывать результат, включая параметры вычисления,
+    например ('corr', 'pearson').
+    """
+    label = name if isinstance(name, str) else ' '.join(part for part in name if isinstance(part, str))
+
+    def traced_compute():
+        with span(label, rows=len(df)):
+            return compute()
+
+    return _MEMO.get_or_compute(dataset_key(df), name, traced_compute)
+
+
+def get_memo():
+    return _MEMO
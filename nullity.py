@@ -0,0 +1,129 @@
+"""Матрица пропусков, упакованная по битам (np.packbits): 1 бит на ячейку.
+
+Маска строится один раз; число пропусков по столбцам, совместная
+пропущенность, частые шаблоны пропусков и тепловая карта считаются из
+упакованного представления частями по CHUNK_ROWS строк, без таблицы
+bool размером строки x столбцы.
+"""
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 1 << 16
+TOP_PATTERNS = 15
+HEATMAP_ROWS = 200
+
+_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+class NullityMatrix:
+    """Маска пропусков: packed[i] - упакованные биты столбца columns[i] по строкам."""
+
+    def __init__(self, packed, n_rows, columns):
+        self.packed = packed
+        self.n_rows = n_rows
+        self.columns = pd.Index(columns)
+        self._results = {}
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def counts(self):
+        """Число пропусков в каждом столбце (подсчет единичных битов)."""
+        if not len(self.columns):
+            return pd.Series(dtype=np.int64, index=self.columns)
+        return pd.Series(_POPCOUNT[self.packed].sum(axis=1, dtype=np.int64), index=self.columns)
+
+    def _unpack(self, positions, start, stop):
+        """Биты строк [start, stop) столбцов positions: массив uint8 (столбцы x строки)."""
+        first_byte = start // 8
+        bits = np.unpackbits(self.packed[positions, first_byte:-(-stop // 8)], axis=1)
+        return bits[:, start - first_byte * 8:stop - first_byte * 8]
+
+    def _chunks(self, positions, start=0, stop=None):
+        """Распакованные части (столбцы positions x строки) по CHUNK_ROWS строк."""
+        stop = self.n_rows if stop is None else stop
+        for chunk_start in range(start, stop, CHUNK_ROWS):
+            yield chunk_start, self._unpack(positions, chunk_start, min(stop, chunk_start + CHUNK_ROWS))
+
+    def _missing_positions(self):
+        return np.flatnonzero(self.counts().to_numpy() > 0)
+
+    def co_missingness(self):
+        """Корреляция (phi) индикаторов пропуска между столбцами, в которых есть пропуски."""
+        if 'co_missingness' not in self._results:
+            self._results['co_missingness'] = self._co_missingness()
+        return self._results['co_missingness']
+
+    def _co_missingness(self):
+        positions = self._missing_positions()
+        m = len(positions)
+        both = np.zeros((m, m))
+        for _, chunk in self._chunks(positions):
+            chunk = chunk.astype(np.float32)
+            both += chunk @ chunk.T
+        n = self.n_rows
+        missing = np.diag(both).copy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            phi = (n * both - np.outer(missing, missing)) / np.sqrt(np.outer(missing * (n - missing),
+                                                                            missing * (n - missing)))
+        columns = self.columns[positions]
+        return pd.DataFrame(np.clip(phi, -1, 1), index=columns, columns=columns)
+
+    def patterns(self, top=TOP_PATTERNS):
+        """Самые частые шаблоны пропусков по строкам среди столбцов с пропусками.
+
+        Возвращает (таблица: по столбцу на переменную с True там, где пропуск,
+        плюс число и доля строк; всего различных шаблонов).
+        """
+        if ('patterns', top) not in self._results:
+            self._results[('patterns', top)] = self._patterns(top)
+        return self._results[('patterns', top)]
+
+    def _patterns(self, top):
+        positions = self._missing_positions()
+        columns = self.columns[positions]
+        if not len(positions):
+            return pd.DataFrame(columns=list(columns) + ['Строк', 'Доля, %']), 0
+        keys, counts = [], []
+        for _, chunk in self._chunks(positions):
+            # Шаблон строки - ее биты по столбцам, упакованные в байты
+            row_bytes = np.ascontiguousarray(np.packbits(chunk, axis=0).T)
+            chunk_keys, chunk_counts = np.unique(row_bytes.view(np.dtype((np.void, row_bytes.shape[1]))),
+                                                 return_counts=True)
+            keys.append(chunk_keys)
+            counts.append(chunk_counts)
+        keys = np.concatenate(keys)
+        counts = np.concatenate(counts)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        totals = np.bincount(inverse.ravel(), weights=counts).astype(np.int64)
+        order = np.argsort(-totals, kind='stable')[:top]
+
+        pattern_bytes = unique_keys[order].view(np.uint8).reshape(len(order), -1)
+        flags = np.unpackbits(pattern_bytes, axis=1, count=len(columns)).astype(bool)
+        table = pd.DataFrame(flags, columns=columns)
+        table['Строк'] = totals[order]
+        table['Доля, %'] = (totals[order] / self.n_rows * 100).round(2)
+        return table, len(unique_keys)
+
+    def heatmap(self, start=0, stop=None, max_rows=HEATMAP_ROWS):
+        """Доля пропусков по столбцам в не более чем max_rows интервалах строк [start, stop).
+
+        Возвращает DataFrame: индекс - первая строка интервала, столбцы - переменные.
+        """
+        stop = self.n_rows if stop is None else min(stop, self.n_rows)
+        start = max(0, min(start, stop))
+        n = stop - start
+        if not n:
+            return pd.DataFrame(columns=self.columns)
+
+        edges = np.unique(np.linspace(0, n, min(max_rows, n) + 1).astype(np.int64))[:-1]
+        sums = np.zeros((len(self.columns), len(edges)), dtype=np.int64)
+        positions = np.arange(len(self.columns))
+        for chunk_start, chunk in self._chunks(positions, start, stop):
+            bins = np.searchsorted(edges, np.arange(chunk.shape[1]) + chunk_start - start, side='right') - 1
+            changes = np.flatnonzero(np.diff(bins, prepend=-1))
+            sums[:, bins[changes]] += np.add.reduceat(chunk, changes, axis=1, dtype=np.int64)
+        sizes = np.diff(np.append(edges, n))
+        return pd.DataFrame((sums / sizes).T, index=pd.Index(edges + start, name='Строка'), columns=self.columns)
+
@@ -0,0 +1,171 @@
+"""Процессный реестр разобранных таблиц, общий для всех сессий.
+
+Каждый набор данных (ключ - хэш содержимого) хранится в одном экземпляре.
+Сессии получают неглубокие копии: столбцы не копируются, а благодаря
+копированию при записи (Copy-on-Write) изменение таблицы в сессии копирует
+только затронутые столбцы и не видно ни в реестре, ни в других сессиях.
+Реестр считает, какие сессии держат набор данных; наборы, которые никто
+не держит, вытесняются в порядке LRU вместе с производными результатами
+из memo, когда превышены ограничения по объему или числу записей.
+"""
+import os
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+
+from memo import get_memo
+
+DEFAULT_CACHE_BYTES = int(os.environ.get('ANALYSIS_CACHE_MB', '2048')) * 1024 ** 2
+DEFAULT_CACHE_ENTRIES = int(os.environ.get('ANALYSIS_CACHE_ENTRIES', '16'))
+
+if int(pd.__version__.split('.')[0]) < 3:
+    # В pandas 3 копирование при записи включено всегда
+    pd.set_option('mode.copy_on_write', True)
+
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def shared_view(df):
+    """Таблица с теми же буферами столбцов; изменения в ней не затрагивают df."""
+    return df.copy(deep=False)
+
+
+class _Entry:
+    def __init__(self, df, nbytes):
+        self.df = df
+        self.nbytes = nbytes
+        self.holders = set()
+
+
+class DatasetRegistry:
+    """Один экземпляр каждой таблицы на процесс со счетчиком держащих ее сессий.
+
+    holder - идентификатор сессии (см. RegistryHolder). Таблицы, которые
+    держит хотя бы одна сессия, не вытесняются: они все равно остаются в
+    памяти, пока сессия с ними работает.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, max_entries=DEFAULT_CACHE_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, holder=None):
+        """Представление таблицы key (или None); holder начинает держать ее."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if holder is not None:
+                entry.holders.add(holder)
+            df = entry.df
+        return shared_view(df)
+
+    def put(self, key, df, holder=None):
+        """Регистрирует df под ключом key и возвращает его представление.
+
+        Если такая таблица уже есть (ее разобрала другая сессия), возвращается
+        представление уже зарегистрированной, а df отбрасывается.
+        """
+        nbytes = frame_nbytes(df)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(df, nbytes)
+                self._total_bytes += nbytes
+            self._entries.move_to_end(key)
+            if holder is not None:
+                entry.holders.add(holder)
+            evicted = self._evict()
+            df = entry.df
+        self._drop_results(evicted)
+        return shared_view(df)
+
+    def release(self, key, holder):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.holders.discard(holder)
+            evicted = self._evict()
+        self._drop_results(evicted)
+
+    def release_holder(self, holder, keep=None):
+        """Освобождает все таблицы, которые держит holder, кроме keep."""
+        with self._lock:
+            for key, entry in self._entries.items():
+                if key != keep:
+                    entry.holders.discard(holder)
+            evicted = self._evict()
+        self._drop_results(evicted)
+
+    def _evict(self):
+        evicted = []
+        for key in list(self._entries):
+            if self._total_bytes <= self.max_bytes and len(self._entries) <= self.max_entries:
+                break
+            entry = self._entries[key]
+            if not entry.holders:
+                del self._entries[key]
+                self._total_bytes -= entry.nbytes
+                evicted.append(key)
+        return evicted
+
+    @staticmethod
+    def _drop_results(keys):
+        for key in keys:
+            get_memo().drop(key)
+
+    def holders(self, key):
+        """Число сессий, которые держат таблицу key."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return len(entry.holders) if entry is not None else 0
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            self._total_bytes = 0
+        self._drop_results(keys)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+
+class RegistryHolder:
+    """Идентификатор сессии в реестре.
+
+    Хранится в состоянии сессии; когда сессия завершается и объект
+    собирается сборщиком мусора, все его таблицы освобождаются.
+    """
+
+    def __init__(self, registry):
+        self.id = uuid.uuid4().hex
+        weakref.finalize(self, registry.release_holder, self.id)
+
+
+_REGISTRY = DatasetRegistry()
+
+
+def get_registry():
+    return _REGISTRY
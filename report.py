@@ -0,0 +1,203 @@
+"""Содержимое отчета без привязки к интерфейсу: проверки качества, инсайты, таблицы и текст.
+
+Функции принимают готовый профиль (DataProfile или StreamingProfile) и
+используются как страницей Streamlit, так и пакетным режимом (cli.py).
+"""
+import json
+
+import pandas as pd
+
+from data_profile import DEFAULT_RANK_ERROR
+from duplicates import GROUP_PREVIEW
+
+CRITICAL_MISSING_PCT = 50
+HIGH_MISSING_PCT = 20
+HIGH_SKEW = 1
+HIGH_OUTLIER_SHARE = 0.05
+HIGH_CARDINALITY = 50
+
+STATS_LABELS = {
+    'count': 'Количество',
+    'mean': 'Среднее',
+    'std': 'Стд. отклонение',
+    'min': 'Минимум',
+    '25%': '25-й перцентиль',
+    '50%': 'Медиана',
+    '75%': '75-й перцентиль',
+    'max': 'Максимум',
+    'skewness': 'Асимметрия',
+    'kurtosis': 'Эксцесс'
+}
+
+
+def format_with_error(value, error):
+    return f"{value:,} ± {error:,}" if error else f"{value:,}"
+
+
+def missing_table(profile):
+    missing_series = profile.null_counts[profile.null_counts > 0]
+    return pd.DataFrame({
+        'Переменная': missing_series.index,
+        'Количество пропусков': missing_series.values,
+        'Доля пропусков, %': (missing_series.values / profile.n_rows * 100).round(2)
+    }).sort_values('Количество пропусков', ascending=False)
+
+
+def quality_checks(profile, exact_counts=False):
+    """(предупреждения, информационные сообщения) диагностики качества."""
+    warnings_list = []
+    info_list = []
+
+    duplicates = profile.duplicate_index
+    if duplicates.count > 0:
+        warnings_list.append(f"Обнаружено полных дубликатов записей: {duplicates.count} "
+                             f"(групп: {duplicates.n_groups}, крупнейшая - {duplicates.group_sizes[0]} строк)")
+
+    for col in profile.numeric_cols:
+        if profile.inf_counts[col] > 0:
+            warnings_list.append(f"Обнаружены бесконечные значения в переменной: '{col}'")
+
+    for col in profile.constant_columns(exact_counts):
+        info_list.append(f"Переменная '{col}' содержит постоянное значение")
+
+    for col in profile.columns:
+        missing_percent = profile.null_pct[col]
+        if missing_percent > CRITICAL_MISSING_PCT:
+            warnings_list.append(f"Критический уровень пропусков в переменной '{col}': {missing_percent:.1f}%")
+
+    return warnings_list, info_list
+
+
+def insights(profile, exact=False, rank_error=DEFAULT_RANK_ERROR, exact_counts=False):
+    """Ключевые инсайты: список пар (уровень, текст), уровень - 'error', 'warning' или 'info'."""
+    found = []
+
+    for col in profile.missing_cols:
+        missing_pct = profile.null_pct[col]
+        if missing_pct > HIGH_MISSING_PCT:
+            found.append(('error', f"⚠️ Высокий уровень пропусков в '{col}': {missing_pct:.1f}%"))
+
+    skewed = profile.skew[profile.skew.abs() > HIGH_SKEW]
+    outlier_counts = profile.outlier_counts(exact, rank_error)
+    for col in profile.numeric_cols:
+        if col in skewed.index:
+            found.append(('warning', f"📊 Сильная асимметрия в '{col}': {skewed[col]:.2f}"))
+
+        outliers_count = outlier_counts[col]
+        if outliers_count > profile.n_rows * HIGH_OUTLIER_SHARE:
+            found.append(('warning', f"🎯 Много выбросов в '{col}': {outliers_count} "
+                                     f"({outliers_count / profile.n_rows * 100:.1f}%)"))
+
+    distinct_counts = profile.distinct_counts(exact_counts)
+    for col in profile.categorical_cols:
+        unique_count, unique_error = distinct_counts.loc[col]
+        if unique_count == 1:
+            found.append(('info', f"📝 Постоянное значение в '{col}'"))
+        elif unique_count > HIGH_CARDINALITY:
+            found.append(('info', f"🏷️ Много уникальных значений в '{col}': "
+                                  f"{format_with_error(unique_count, unique_error)}"))
+
+    return found
+
+
+def duplicate_groups_table(profile, limit=GROUP_PREVIEW):
+    return profile.duplicate_index.groups_frame(limit)
+
+
+def recommendations(profile):
+    found = []
+    if len(profile.numeric_cols) >= 2:
+        found.append("• Проанализировать корреляции между числовыми переменными")
+    if len(profile.categorical_cols) > 0:
+        found.append("• Исследовать взаимосвязи между категориальными и числовыми переменными")
+    if profile.missing_cols.any():
+        found.append("• Рассмотреть методы обработки пропущенных значений")
+    return found
+
+
+def summary_table(profile):
+    return pd.DataFrame({
+        'Метрика': ['Объем данных', 'Количество переменных', 'Числовые переменные',
+                    'Категориальные переменные', 'Пропущенные значения', 'Дубликаты'],
+        'Значение': [
+            f"{profile.n_rows:,}",
+            f"{profile.n_cols:,}",
+            f"{len(profile.numeric_cols):,}",
+            f"{len(profile.categorical_cols):,}",
+            f"{profile.missing_total:,}",
+            f"{profile.duplicate_count:,}"
+        ]
+    })
+
+
+def quality_table(profile):
+    return pd.DataFrame({
+        'Метрика': ['Заполненность данных', 'Уникальность записей', 'Качество данных'],
+        'Значение': [
+            f"{profile.completeness * 100:.1f}%",
+            f"{(1 - profile.duplicate_count / profile.n_rows) * 100:.1f}%",
+            'Высокое' if profile.missing_total == 0 and profile.duplicate_count == 0 else 'Требует внимания'
+        ]
+    })
+
+
+def metadata_table(profile, exact_counts=False):
+    return pd.DataFrame({
+        'Переменная': profile.columns,
+        'Тип данных': profile.dtypes,
+        'Уникальные значения': profile.distinct_counts(exact_counts)['nunique'],
+        'Пропуски': profile.null_counts,
+        'Доля пропусков %': profile.null_pct.round(2)
+    })
+
+
+def text_report(profile, exact=False, rank_error=DEFAULT_RANK_ERROR):
+    duplicates = profile.duplicate_index
+    missing = ', '.join(profile.missing_cols.tolist()) if profile.missing_total > 0 else 'отсутствуют'
+    return f"""
+ОТЧЕТ ПЕРВИЧНОГО АНАЛИЗА ДАННЫХ
+{'=' * 50}
+
+ОБЩАЯ ИНФОРМАЦИЯ:
+• Объем данных: {profile.n_rows:,} наблюдений
+• Количество переменных: {profile.n_cols:,}
+• Числовые переменные: {len(profile.numeric_cols):,}
+• Категориальные переменные: {len(profile.categorical_cols):,}
+
+КАЧЕСТВО ДАННЫХ:
+• Всего пропущенных значений: {profile.missing_total:,}
+• Полных дубликатов записей: {duplicates.count:,} (групп: {duplicates.n_groups:,})
+• Переменные с пропусками: {missing}
+
+СТАТИСТИЧЕСКИЕ ХАРАКТЕРИСТИКИ:
+{profile.describe_for(exact, rank_error).to_string()}
+
+СГЕНЕРИРОВАНО: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}
+        """
+
+
+def _records(frame, orient='records'):
+    """DataFrame -> структуры JSON (NaN становится null, типы numpy - числами Python)."""
+    return json.loads(frame.to_json(orient=orient, force_ascii=False))
+
+
+def report_dict(profile, exact=False, rank_error=DEFAULT_RANK_ERROR, exact_counts=False):
+    """Полный отчет в виде, пригодном для json.dump."""
+    warnings_list, info_list = quality_checks(profile, exact_counts)
+    numeric_stats = profile.numeric_stats(exact=exact, rank_error=rank_error) \
+        if len(profile.numeric_cols) else pd.DataFrame()
+    return {
+        'rows': int(profile.n_rows),
+        'columns': int(profile.n_cols),
+        'numeric_columns': len(profile.numeric_cols),
+        'categorical_columns': len(profile.categorical_cols),
+        'missing_total': int(profile.missing_total),
+        'duplicates': int(profile.duplicate_count),
+        'duplicate_groups': _records(duplicate_groups_table(profile)),
+        'completeness': float(profile.completeness),
+        'quality': {'warnings': warnings_list, 'info': info_list},
+        'insights': [{'level': level, 'text': text} for level, text in insights(profile, exact, rank_error,
+                                                                              exact_counts)],
+        'metadata': _records(metadata_table(profile, exact_counts).astype({'Тип данных': str})),
+        'numeric_stats': _records(numeric_stats, orient='index')
+    }
@@ -0,0 +1,345 @@
+"""Компактные объединяемые структуры для приближенной статистики по столбцам."""
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def _as_values(values):
+    if isinstance(values, pd.Series):
+        values = values.dropna().to_numpy()
+    return np.asarray(values)
+
+
+class KLLSketch:
+    """Скетч квантилей KLL (Karnin, Lang, Liberty) для числового столбца.
+
+    Хранит O(k) элементов на нескольких уровнях; элемент уровня h имеет вес 2**h.
+    Ошибка по рангу для одного квантиля не превышает примерно 3.3 / k с
+    вероятностью 99%. Скетчи с одинаковым k можно объединять через merge().
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = max(int(k), 8)
+        self.n = 0
+        self.min = np.nan
+        self.max = np.nan
+        self._levels = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def for_error(cls, rank_error, seed=None):
+        return cls(k=math.ceil(3.3 / rank_error), seed=seed)
+
+    @property
+    def rank_error(self):
+        return 3.3 / self.k
+
+    def _capacity(self, level):
+        depth = len(self._levels) - level - 1
+        return max(8, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = _as_values(values).astype(np.float64, copy=False)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.min = np.nanmin([self.min, values.min()])
+        self.max = np.nanmax([self.max, values.max()])
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other._levels):
+            self._levels[level] = np.concatenate([self._levels[level], items])
+        self.n += other.n
+        self.min = np.nanmin([self.min, other.min])
+        self.max = np.nanmax([self.max, other.max])
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty(0, dtype=np.float64))
+                items = np.sort(items)
+                keep = items[:len(items) % 2]
+                paired = items[len(items) % 2:]
+                offset = int(self._rng.integers(2))
+                self._levels[level + 1] = np.concatenate([self._levels[level + 1], paired[offset::2]])
+                self._levels[level] = keep
+            level += 1
+
+    def _weighted_items(self):
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(lvl), 2 ** h, dtype=np.float64)
+                                  for h, lvl in enumerate(self._levels)])
+        order = np.argsort(items, kind='mergesort')
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """Приближенный квантиль (скаляр или массив q из [0, 1])."""
+        scalar = np.ndim(q) == 0
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        if self.n == 0:
+            result = np.full(len(q), np.nan)
+        else:
+            items, cum_weights = self._weighted_items()
+            ranks = q * cum_weights[-1]
+            idx = np.clip(np.searchsorted(cum_weights, ranks, side='left'), 0, len(items) - 1)
+            result = items[idx]
+            result = np.where(q <= 0, self.min, np.where(q >= 1, self.max, result))
+        return float(result[0]) if scalar else result
+
+    def rank(self, value, inclusive=True):
+        """Приближенная доля элементов, не превышающих value (при inclusive=False - меньших value)."""
+        if self.n == 0:
+            return np.nan
+        items, cum_weights = self._weighted_items()
+        idx = np.searchsorted(items, value, side='right' if inclusive else 'left')
+        return float(cum_weights[idx - 1] / cum_weights[-1]) if idx > 0 else 0.0
+
+    def __len__(self):
+        return sum(len(lvl) for lvl in self._levels)
+
+
+class SpaceSaving:
+    """Наиболее частые значения (алгоритм Space-Saving) с верхней оценкой ошибки.
+
+    Хранит не более capacity счетчиков. Пока различных значений меньше capacity,
+    счетчики точные. Для каждого значения известна граница error: истинная
+    частота лежит в [count - error, count].
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = int(capacity)
+        self.n = 0
+        self.overflowed = False
+        self._counts = pd.Series(dtype=np.int64)
+        self._errors = pd.Series(dtype=np.int64)
+
+    @property
+    def min_count(self):
+        if not self.overflowed or len(self._counts) == 0:
+            return 0
+        return int(self._counts.min())
+
+    def update(self, values):
+        if not isinstance(values, pd.Series):
+            values = pd.Series(values)
+        counts = values.value_counts(dropna=True)
+        counts = counts[counts > 0]
+        self.n += int(counts.sum())
+        truncated_error = 0
+        if len(counts) > self.capacity:
+            truncated_error = int(counts.iloc[self.capacity])
+            counts = counts.iloc[:self.capacity]
+        self._merge_counts(counts, pd.Series(0, index=counts.index, dtype=np.int64),
+                           truncated_error, truncated_error > 0)
+        return self
+
+    def merge(self, other):
+        self.n += other.n
+        self._merge_counts(other._counts, other._errors, other.min_count, other.overflowed)
+        return self
+
+    def _merge_counts(self, counts, errors, other_floor, other_overflowed):
+        own_floor = self.min_count
+        index = self._counts.index.union(counts.index, sort=False)
+        merged = (self._counts.reindex(index).fillna(own_floor)
+                  + counts.reindex(index).fillna(other_floor)).astype(np.int64)
+        merged_errors = (self._errors.reindex(index).fillna(own_floor)
+                         + errors.reindex(index).fillna(other_floor)).astype(np.int64)
+        self.overflowed = self.overflowed or other_overflowed or len(merged) > self.capacity
+        merged = merged.sort_values(ascending=False, kind='mergesort')
+        if len(merged) > self.capacity:
+            merged = merged.iloc[:self.capacity]
+        self._counts = merged
+        self._errors = merged_errors.reindex(merged.index)
+
+    def top(self, n=15):
+        """Таблица из n самых частых значений: count и граница ошибки error."""
+        counts = self._counts.iloc[:n]
+        return pd.DataFrame({'count': counts, 'error': self._errors.reindex(counts.index)})
+
+    def distinct_count(self):
+        """Точное число различных значений или None, если счетчики переполнены."""
+        return None if self.overflowed else len(self._counts)
+
+
+class HyperLogLog:
+    """Оценка числа различных значений (HyperLogLog с поправкой для малых значений).
+
+    Относительная стандартная ошибка равна 1.04 / sqrt(2**p).
+    """
+
+    def __init__(self, p=14):
+        self.p = int(p)
+        self.m = 1 << self.p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def update(self, values):
+        if isinstance(values, pd.Series):
+            values = values.dropna()
+            if len(values) == 0:
+                return self
+            hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        else:
+            hashes = pd.util.hash_array(np.asarray(values))
+        self.update_hashes(hashes)
+        return self
+
+    def update_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if len(hashes) == 0:
+            return self
+        q = 64 - self.p
+        idx = (hashes >> np.uint64(q)).astype(np.int64)
+        rest = hashes & np.uint64((1 << q) - 1)
+        rho = (q + 1 - _bit_length(rest)).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rho)
+        return self
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("Нельзя объединить HyperLogLog с разной точностью")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros > 0:
+            return m * math.log(m / zeros)
+        return float(raw)
+
+
+def _bit_length(values):
+    """Векторизованный int.bit_length() для массива uint64."""
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = values >= np.uint64(1 << shift)
+        length[mask] += shift
+        values[mask] >>= np.uint64(shift)
+    length += (values > 0)
+    return length
+
+
+class CountMinSketch:
+    """Частоты значений (Count-Min) с гарантией: оценка завышает частоту не более
+    чем на epsilon * n с вероятностью 1 - delta.
+    """
+
+    def __init__(self, epsilon=0.001, delta=0.01, seed=0):
+        self.width = 1 << max(4, math.ceil(math.log2(math.e / epsilon)))
+        self.depth = max(1, math.ceil(math.log(1 / delta)))
+        self.n = 0
+        self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+        rng = np.random.default_rng(seed)
+        self._multipliers = rng.integers(1, 2 ** 63, size=self.depth, dtype=np.uint64) | np.uint64(1)
+        self._shift = np.uint64(64 - int(math.log2(self.width)))
+
+    @property
+    def epsilon(self):
+        return math.e / self.width
+
+    def _buckets(self, hashes):
+        with np.errstate(over='ignore'):
+            return (hashes[None, :] * self._multipliers[:, None]) >> self._shift
+
+    def update_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        self.n += len(hashes)
+        buckets = self._buckets(hashes).astype(np.int64)
+        for row in range(self.depth):
+            self.table[row] += np.bincount(buckets[row], minlength=self.width)
+        return self
+
+    def estimate_hashes(self, hashes):
+        buckets = self._buckets(np.asarray(hashes, dtype=np.uint64)).astype(np.int64)
+        return self.table[np.arange(self.depth)[:, None], buckets].min(axis=0)
+
+    def merge(self, other):
+        self.table += other.table
+        self.n += other.n
+        return self
+
+
+def hash_values(series):
+    return pd.util.hash_pandas_object(series, index=False).to_numpy()
+
+
+class ColumnSketch:
+    """Приближенные частотные характеристики одного столбца.
+
+    Число уникальных значений точно, пока их меньше емкости Space-Saving, и
+    оценивается HyperLogLog выше нее. Частые значения отбираются Space-Saving,
+    а их частоты уточняются Count-Min; для каждой частоты возвращается
+    граница ошибки.
+    """
+
+    def __init__(self, capacity=100, hll_precision=14, cms_epsilon=0.001):
+        self.top = SpaceSaving(capacity)
+        self.hll = HyperLogLog(hll_precision)
+        self.cms = CountMinSketch(epsilon=cms_epsilon)
+        self.dtype = None
+
+    @property
+    def n(self):
+        return self.top.n
+
+    def update(self, series):
+        series = series.dropna()
+        if self.dtype is None:
+            self.dtype = series.dtype
+        if len(series) == 0:
+            return self
+        hashes = hash_values(series)
+        self.hll.update_hashes(hashes)
+        self.cms.update_hashes(hashes)
+        self.top.update(series)
+        return self
+
+    def merge(self, other):
+        self.top.merge(other.top)
+        self.hll.merge(other.hll)
+        self.cms.merge(other.cms)
+        self.dtype = self.dtype if self.dtype is not None else other.dtype
+        return self
+
+    def distinct_count(self):
+        """(оценка, погрешность); погрешность - две стандартные ошибки HyperLogLog."""
+        exact = self.top.distinct_count()
+        if exact is not None:
+            return exact, 0
+        estimate = self.hll.estimate()
+        return int(round(estimate)), int(math.ceil(2 * self.hll.relative_error * estimate))
+
+    def heavy_hitters(self, n=15):
+        """n самых частых значений: count - верхняя оценка частоты, error - ширина интервала."""
+        top = self.top.top(n)
+        if len(top) == 0 or not self.top.overflowed:
+            return top
+        candidates = pd.Series(top.index, dtype=self.dtype)
+        cms_counts = self.cms.estimate_hashes(hash_values(candidates))
+        upper = np.minimum(top['count'].to_numpy(), cms_counts)
+        lower = np.maximum(top['count'].to_numpy() - top['error'].to_numpy(),
+                           cms_counts - int(math.ceil(self.cms.epsilon * self.cms.n)))
+        result = pd.DataFrame({'count': upper, 'error': upper - np.maximum(lower, 0)}, index=top.index)
+        return result.sort_values('count', ascending=False, kind='mergesort')
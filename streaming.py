@@ -0,0 +1,237 @@
+"""Потоковое построение профиля CSV по частям без загрузки таблицы целиком."""
+import io
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from data_profile import ProfileBase, categorical_columns
+from duplicates import DuplicateIndex
+from loader import content_hash
+from memo import get_memo
+from sketches import ColumnSketch, KLLSketch
+
+DEFAULT_CHUNK_ROWS = 100_000
+DEFAULT_QUANTILE_ERROR = 0.01
+TOP_K_CAPACITY = 100
+_NULL_HASH = np.uint64(0x9E3779B97F4A7C15)
+_HASH_MULTIPLIER = np.uint64(1_000_003)
+
+
+class RunningMoments:
+    """Количество, среднее, дисперсия (Welford/Chan), минимум и максимум."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        n_b = len(values)
+        if n_b == 0:
+            return self
+        mean_b = float(values.mean())
+        m2_b = float(((values - mean_b) ** 2).sum())
+        self._merge(n_b, mean_b, m2_b, float(values.min()), float(values.max()))
+        return self
+
+    def merge(self, other):
+        if other.count:
+            self._merge(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    def _merge(self, n_b, mean_b, m2_b, min_b, max_b):
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * n_a * n_b / n
+        self.count = n
+        self.min = np.nanmin([self.min, min_b])
+        self.max = np.nanmax([self.max, max_b])
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.variance))
+
+
+def _merge_dtype(current, new):
+    if current is None or current == new:
+        return new
+    if pd.api.types.is_numeric_dtype(current) and pd.api.types.is_numeric_dtype(new) \
+            and not pd.api.types.is_bool_dtype(current) and not pd.api.types.is_bool_dtype(new):
+        return np.result_type(current, new)
+    return np.dtype(object)
+
+
+def _hashable_values(series):
+    """Значения столбца в виде, не зависящем от типа, выведенного для отдельной части.
+
+    Числа и логические значения (в том числе object из True/False с пропусками)
+    приводятся к float64, остальное - к строкам: тогда 1 из части с int64 и
+    1.0 из части, где в столбце был пропуск, дают один хэш.
+    """
+    if pd.api.types.is_numeric_dtype(series.dtype) or \
+            (pd.api.types.is_object_dtype(series.dtype) and pd.api.types.infer_dtype(series, skipna=True) == 'boolean'):
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return series.astype(str).to_numpy(dtype=object)
+
+
+def row_hashes(chunk):
+    """64-битные хэши строк части; пропуск в любом столбце хэшируется одной меткой."""
+    hashes = np.zeros(len(chunk), dtype=np.uint64)
+    for col in chunk.columns:
+        series = chunk[col]
+        column_hashes = pd.util.hash_array(_hashable_values(series))
+        column_hashes[series.isna().to_numpy()] = _NULL_HASH
+        hashes = hashes * _HASH_MULTIPLIER ^ column_hashes
+    return hashes
+
+
+class StreamingProfile(ProfileBase):
+    """Профиль, накапливаемый по частям таблицы.
+
+    Пропуски, количество, минимум/максимум, среднее и дисперсия считаются
+    точно; квантили - по скетчу KLL, частые значения и число уникальных
+    значений - по ColumnSketch (точно до TOP_K_CAPACITY значений).
+    Дубликаты строк определяются по 64-битным хэшам строк: это единственная
+    часть профиля, которая растет с числом строк (8 байт на строку).
+    """
+
+    def __init__(self, quantile_error=DEFAULT_QUANTILE_ERROR):
+        self.quantile_error = quantile_error
+        self.n_rows = 0
+        self.n_chunks = 0
+        self.preview = None
+        self._dtypes = {}
+        self._nulls = {}
+        self._moments = {}
+        self._quantiles = {}
+        self._infs = {}
+        self._sketches = {}
+        self._row_hashes = []
+
+    def update(self, chunk):
+        if self.preview is None:
+            self.preview = chunk.head(10)
+
+        self.n_rows += len(chunk)
+        self.n_chunks += 1
+        self._row_hashes.append(row_hashes(chunk))
+
+        chunk_nulls = chunk.isna().sum()
+        for col in chunk.columns:
+            series = chunk[col]
+            dtype = _merge_dtype(self._dtypes.get(col), series.dtype)
+            self._dtypes[col] = dtype
+            self._nulls[col] = self._nulls.get(col, 0) + int(chunk_nulls[col])
+
+            if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+                self._moments.setdefault(col, RunningMoments()).update(values)
+                self._quantiles.setdefault(col, KLLSketch.for_error(self.quantile_error)).update(values)
+                self._infs[col] = self._infs.get(col, 0) + int(np.isinf(values).sum())
+            else:
+                for stats in (self._moments, self._quantiles, self._infs):
+                    stats.pop(col, None)
+
+            self._sketches.setdefault(col, ColumnSketch(TOP_K_CAPACITY)).update(series)
+
+        for name in ('_frame_template', 'duplicate_index', 'numeric_describe'):
+            self.__dict__.pop(name, None)
+        return self
+
+    @cached_property
+    def _frame_template(self):
+        return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in self._dtypes.items()})
+
+    @property
+    def columns(self):
+        return self._frame_template.columns
+
+    @property
+    def n_cols(self):
+        return len(self._dtypes)
+
+    @property
+    def dtypes(self):
+        return self._frame_template.dtypes
+
+    @property
+    def numeric_cols(self):
+        return self._frame_template.select_dtypes(include=[np.number]).columns
+
+    @property
+    def categorical_cols(self):
+        return categorical_columns(self._frame_template)
+
+    @property
+    def null_counts(self):
+        return pd.Series(self._nulls, index=self.columns, dtype=np.int64)
+
+    @property
+    def missing_total(self):
+        return int(sum(self._nulls.values()))
+
+    def distinct_counts(self, exact=False):
+        counts = [self._sketches[col].distinct_count() for col in self.columns]
+        return pd.DataFrame(counts, index=self.columns, columns=['nunique', 'error'], dtype=np.int64)
+
+    @property
+    def nunique(self):
+        return self.distinct_counts()['nunique']
+
+    @property
+    def inf_counts(self):
+        return pd.Series(self._infs, index=self.numeric_cols, dtype=np.int64)
+
+    @cached_property
+    def duplicate_index(self):
+        """Группы дубликатов только по хэшам: строки целиком не хранятся."""
+        hashes = np.concatenate(self._row_hashes) if self._row_hashes else np.array([], dtype=np.uint64)
+        return DuplicateIndex(hashes)
+
+    @cached_property
+    def numeric_describe(self):
+        stats = {}
+        for col in self.numeric_cols:
+            moments = self._moments[col]
+            q25, q50, q75 = self._quantiles[col].quantile([0.25, 0.5, 0.75])
+            stats[col] = [float(moments.count), moments.mean if moments.count else np.nan, moments.std,
+                          moments.min, q25, q50, q75, moments.max]
+        return pd.DataFrame(stats, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'])
+
+    @property
+    def describe(self):
+        return self.numeric_describe
+
+    def quantile_sketch(self, col):
+        return self._quantiles[col]
+
+    def top_values(self, col, n=15, exact=False):
+        return self._sketches[col].heavy_hitters(n)
+
+
+def profile_csv_stream(source, chunk_rows=DEFAULT_CHUNK_ROWS, quantile_error=DEFAULT_QUANTILE_ERROR, **read_kwargs):
+    """Строит StreamingProfile, читая CSV (путь или файловый объект) частями по chunk_rows строк."""
+    profile = StreamingProfile(quantile_error=quantile_error)
+    with pd.read_csv(source, chunksize=chunk_rows, **read_kwargs) as reader:
+        for chunk in reader:
+            profile.update(chunk)
+    return profile
+
+
+def profile_uploaded_csv(uploaded_file, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Потоковый профиль загруженного CSV, общий для всех сессий с тем же содержимым."""
+    data = uploaded_file.getvalue()
+    key = content_hash(data)
+    return get_memo().get_or_compute(
+        key, ('stream_profile', chunk_rows),
+        lambda: profile_csv_stream(io.BytesIO(data), chunk_rows=chunk_rows))
@@ -0,0 +1,119 @@
+"""Линии тренда (OLS и LOWESS) для диаграмм рассеяния, посчитанные по всем данным."""
+import numpy as np
+import plotly.graph_objects as go
+
+from memo import memoize
+
+LOWESS_FRAC = 2 / 3
+LOWESS_GRID_POINTS = 100
+LOWESS_MAX_POINTS = 5_000
+LOWESS_ITERATIONS = 2
+
+
+def paired_values(df, x, y):
+    """Пары (x, y) без пропусков и бесконечностей."""
+    x_values = df[x].to_numpy(dtype=np.float64, na_value=np.nan)
+    y_values = df[y].to_numpy(dtype=np.float64, na_value=np.nan)
+    finite = np.isfinite(x_values) & np.isfinite(y_values)
+    return x_values[finite], y_values[finite]
+
+
+def ols_fit(x, y):
+    """Аналитическая МНК-регрессия y = slope * x + intercept по суммам и попарным произведениям."""
+    n = len(x)
+    if n < 2:
+        return None
+    x_mean, y_mean = x.mean(), y.mean()
+    dx, dy = x - x_mean, y - y_mean
+    sxx, sxy, syy = dx @ dx, dx @ dy, dy @ dy
+    if sxx == 0:
+        return None
+    slope = sxy / sxx
+    intercept = y_mean - slope * x_mean
+    r2 = sxy * sxy / (sxx * syy) if syy > 0 else 1.0
+    return {'slope': slope, 'intercept': intercept, 'r2': r2, 'n': n,
+            'x_range': (x.min(), x.max())}
+
+
+def _tricube(u):
+    return np.clip(1 - np.abs(u) ** 3, 0, None) ** 3
+
+
+def _local_linear(x, y, weights, grid, frac):
+    """Значения локальной линейной регрессии в точках grid (ширина окна - доля frac точек)."""
+    n = len(x)
+    k = max(2, min(n, int(np.ceil(frac * n))))
+    distances = np.abs(grid[:, None] - x[None, :])
+    bandwidth = np.partition(distances, k - 1, axis=1)[:, k - 1]
+    bandwidth = np.where(bandwidth > 0, bandwidth, 1.0)
+    w = _tricube(distances / bandwidth[:, None]) * weights[None, :]
+
+    sw = w.sum(axis=1)
+    swx = w @ x
+    swy = w @ y
+    swxx = w @ (x * x)
+    swxy = w @ (x * y)
+    denominator = sw * swxx - swx * swx
+    safe = np.abs(denominator) > 1e-12 * np.maximum(sw * swxx, 1e-300)
+    slope = np.where(safe, (sw * swxy - swx * swy) / np.where(safe, denominator, 1), 0.0)
+    intercept = (swy - slope * swx) / np.where(sw > 0, sw, 1)
+    return intercept + slope * grid
+
+
+def lowess_curve(x, y, frac=LOWESS_FRAC, grid_points=LOWESS_GRID_POINTS, max_points=LOWESS_MAX_POINTS,
+                 iterations=LOWESS_ITERATIONS, seed=0):
+    """LOWESS, вычисленный на фиксированной сетке по x.
+
+    При числе точек больше max_points сглаживание строится по равномерной
+    выборке. Веса устойчивости (bisquare) пересчитываются по остаткам
+    относительно интерполированной по сетке кривой.
+    """
+    n = len(x)
+    if n < 3 or x.min() == x.max():
+        return None
+    if n > max_points:
+        positions = np.random.default_rng(seed).choice(n, size=max_points, replace=False)
+        x, y = x[positions], y[positions]
+
+    grid = np.linspace(x.min(), x.max(), grid_points)
+    weights = np.ones(len(x))
+    fitted = _local_linear(x, y, weights, grid, frac)
+    for _ in range(iterations):
+        residuals = y - np.interp(x, grid, fitted)
+        scale = 6 * np.median(np.abs(residuals))
+        if scale == 0:
+            break
+        weights = np.clip(1 - (residuals / scale) ** 2, 0, None) ** 2
+        fitted = _local_linear(x, y, weights, grid, frac)
+    return {'x': grid, 'y': fitted, 'n': n, 'sampled': len(x)}
+
+
+def cached_ols(df, x, y):
+    return memoize(df, ('ols', x, y), lambda: ols_fit(*paired_values(df, x, y)))
+
+
+def cached_lowess(df, x, y, frac=LOWESS_FRAC):
+    return memoize(df, ('lowess', x, y, frac), lambda: lowess_curve(*paired_values(df, x, y), frac=frac))
+
+
+def add_ols_trace(fig, fit, color='#d62728'):
+    if fit is None:
+        return fig
+    x_line = np.array(fit['x_range'])
+    fig.add_trace(go.Scatter(
+        x=x_line, y=fit['slope'] * x_line + fit['intercept'], mode='lines',
+        line=dict(color=color, width=2), name='OLS', showlegend=False,
+        hovertemplate=(f"<b>OLS trendline</b><br>y = {fit['slope']:.4g} * x + {fit['intercept']:.4g}"
+                       f"<br>R<sup>2</sup>={fit['r2']:.4f}<br>n={fit['n']:,}<extra></extra>")))
+    return fig
+
+
+def add_lowess_trace(fig, curve, color='#d62728'):
+    if curve is None:
+        return fig
+    sample_note = f" (по выборке {curve['sampled']:,})" if curve['sampled'] < curve['n'] else ""
+    fig.add_trace(go.Scatter(
+        x=curve['x'], y=curve['y'], mode='lines', line=dict(color=color, width=2),
+        name='LOWESS', showlegend=False,
+        hovertemplate=f"<b>LOWESS trendline</b>{sample_note}<br>%{{x:.4g}}, %{{y:.4g}}<extra></extra>"))
+    return fig